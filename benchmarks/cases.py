@@ -0,0 +1,109 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark cases
+
+Each case is called with the page text and returns a function that does the
+work to be timed, anything done before returning is setup and is not timed
+"""
+
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.utils import wiki_finditer, wiki_splitlines, wiki_replace, scan_templates
+
+
+def _pos_sections(text):
+    entry = parser.parse(text, "test")
+    return [s for s in entry.ifilter_sections() if s.title in parser.ALL_POS]
+
+def bench_wiki_finditer(text):
+    return lambda: sum(1 for _ in wiki_finditer("\n", text))
+
+def bench_wiki_splitlines(text):
+    return lambda: list(wiki_splitlines(text))
+
+def bench_wiki_replace(text):
+    return lambda: wiki_replace("test", "exam", text)
+
+def bench_parse(text):
+    return lambda: parser.parse(text, "test")
+
+def bench_scan_headings(text):
+    return lambda: parser.scan_headings(text)
+
+def bench_serialize(text):
+    entry = parser.parse(text, "test")
+    return lambda: str(entry)
+
+def bench_parse_pos(text):
+    sections = _pos_sections(text)
+    return lambda: [parser.parse_pos(section) for section in sections]
+
+def bench_parse_pos_lazy(text):
+    # Counting the senses doesn't need the subitems or any item types
+    sections = _pos_sections(text)
+    return lambda: [len(parser.parse_pos(section, lazy=True).senses) for section in sections]
+
+def _template_items(text):
+    items = []
+    for section in _pos_sections(text):
+        stack = list(parser.parse_pos(section).senses)
+        while stack:
+            item = stack.pop()
+            stack += item._children
+            if "{{" in item.data:
+                items.append(item.data)
+    return items
+
+def bench_scan_templates(text):
+    items = _template_items(text)
+    return lambda: [scan_templates(data) for data in items]
+
+def bench_mwparse_templates(text):
+    # The mwparserfromhell equivalent of scan_templates, for comparison
+    items = _template_items(text)
+    mwparse = parser.posparser.mwparse
+    return lambda: [list(mwparse(data).ifilter_templates(recursive=False)) for data in items]
+
+def bench_set_item_types(text):
+    # Without the item type cache, every item is classified on every run
+    pos_parsers = [parser.parse_pos(section, type_cache=False) for section in _pos_sections(text)]
+    def run():
+        for pos in pos_parsers:
+            pos.set_item_types(pos.senses)
+    return run
+
+def bench_set_item_types_cached(text):
+    pos_parsers = [parser.parse_pos(section) for section in _pos_sections(text)]
+    def run():
+        for pos in pos_parsers:
+            pos.set_item_types(pos.senses)
+    return run
+
+
+CASES = {
+    "wiki_finditer": bench_wiki_finditer,
+    "wiki_splitlines": bench_wiki_splitlines,
+    "wiki_replace": bench_wiki_replace,
+    "parse": bench_parse,
+    "scan_headings": bench_scan_headings,
+    "serialize": bench_serialize,
+    "parse_pos": bench_parse_pos,
+    "parse_pos_lazy": bench_parse_pos_lazy,
+    "set_item_types": bench_set_item_types,
+    "set_item_types_cached": bench_set_item_types_cached,
+    "scan_templates": bench_scan_templates,
+    "mwparse_templates": bench_mwparse_templates,
+}
@@ -0,0 +1,79 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Import time benchmark
+
+    python -m benchmarks.imports                 # report import time
+    python -m benchmarks.imports --budget 0.05   # exit 1 if importing takes more than 50ms
+
+Each sample imports the package in a fresh interpreter, so the time includes
+every dependency the package imports but not the interpreter startup.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Modules that should only be imported when they're used
+LAZY_MODULES = ["mwparserfromhell", "enwiktionary_sectionparser.posparser"]
+
+_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import enwiktionary_sectionparser
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+def measure_import():
+    """ Returns (seconds to import the package in a fresh interpreter, list of loaded modules) """
+    res = json.loads(subprocess.run([sys.executable, "-c", _SCRIPT], check=True, capture_output=True, text=True).stdout)
+    return res["elapsed"], res["modules"]
+
+def run(samples=5, out=sys.stdout):
+    timings = []
+    for _ in range(samples):
+        elapsed, modules = measure_import()
+        timings.append(elapsed)
+
+    eager = [m for m in LAZY_MODULES if m in modules]
+    median = statistics.median(timings)
+    print(f"import enwiktionary_sectionparser  median {median*1000:8.2f}ms  min {min(timings)*1000:8.2f}ms", file=out)
+    for module in eager:
+        print(f"{module} was imported eagerly", file=out)
+
+    return median, eager
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Measure the import time of enwiktionary_sectionparser")
+    argparser.add_argument("--samples", type=int, default=5, help="Number of fresh interpreters to time")
+    argparser.add_argument("--budget", type=float, help="Maximum median import time, in seconds")
+    args = argparser.parse_args(argv)
+
+    median, eager = run(args.samples)
+    if eager:
+        return 1
+
+    if args.budget is not None and median > args.budget:
+        print(f"OVER BUDGET {median*1000:.2f}ms > {args.budget*1000:.2f}ms")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
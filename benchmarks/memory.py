@@ -0,0 +1,145 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Memory benchmarks
+
+    python -m benchmarks.memory                          # run everything
+    python -m benchmarks.memory --save baseline.json     # save a baseline
+    python -m benchmarks.memory --compare baseline.json  # exit 1 on regressions
+
+For each page size, reports the peak allocation while parsing (measured with
+tracemalloc), the memory still allocated by the result afterwards and the deep
+size of the result relative to the page text.
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import sys
+import tracemalloc
+
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.memory import memory_report
+from enwiktionary_sectionparser.posparser import ITEM_TYPE_CACHE
+from enwiktionary_sectionparser.sensetree import SenseTree
+from .cases import _pos_sections
+from .pages import PAGES
+from .run import compare, meta
+
+
+def mem_parse(text):
+    return lambda: parser.parse(text, "test"), ()
+
+def mem_parse_pos(text):
+    sections = _pos_sections(text)
+    # Start with an empty type cache, so the retained memory doesn't depend on the cases run before
+    ITEM_TYPE_CACHE.clear()
+    # The page is not part of the PosParser footprint
+    return lambda: [parser.parse_pos(section) for section in sections], sections
+
+def mem_sense_tree(text):
+    pos_parsers = [parser.parse_pos(section) for section in _pos_sections(text)]
+    def build():
+        tree = SenseTree()
+        for pos in pos_parsers:
+            tree.add(pos)
+        return tree
+    return build, pos_parsers
+
+CASES = {
+    "parse": mem_parse,
+    "parse_pos": mem_parse_pos,
+    "sense_tree": mem_sense_tree,
+}
+
+
+def measure(func):
+    """ Returns (peak bytes allocated during func(), bytes retained afterwards, result) """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        res = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak - start, current - start, res
+
+def run(cases=CASES, pages=PAGES, match="*", sizes=None, out=sys.stdout):
+    results = {}
+    for case_name, case in cases.items():
+        for size_name, text in pages.items():
+            name = f"{case_name}/{size_name}"
+            if not fnmatch.fnmatch(name, match) or (sizes and size_name not in sizes):
+                continue
+
+            func, exclude = case(text)
+            peak, retained, res = measure(func)
+            report = memory_report(res, exclude=exclude)
+            size = sys.getsizeof(text)
+            results[name] = {
+                "peak": peak,
+                "retained": retained,
+                "deep_size": report.total,
+                "peak_ratio": peak/size,
+                "deep_ratio": report.total/size,
+            }
+            print(format_result(name, results[name]), file=out)
+
+    return {"meta": meta(), "results": results}
+
+def format_result(name, result):
+    return f"{name:32} peak {result['peak']/1024:10.1f}KiB  retained {result['retained']/1024:10.1f}KiB  " \
+           f"deep {result['deep_size']/1024:10.1f}KiB  {result['peak_ratio']:6.1f}x/{result['deep_ratio']:6.1f}x text"
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Run the enwiktionary_sectionparser memory benchmarks")
+    argparser.add_argument("--match", default="*", help="Only run benchmarks matching this glob, eg 'parse/*'")
+    argparser.add_argument("--sizes", help="Comma separated list of page sizes (%s)" % ", ".join(PAGES))
+    argparser.add_argument("--save", help="Save results to this JSON file")
+    argparser.add_argument("--compare", help="Compare results against this JSON baseline")
+    argparser.add_argument("--threshold", type=float, default=0.1, help="Allowed growth before a benchmark is a regression (default 0.1 = 10%%)")
+    args = argparser.parse_args(argv)
+
+    sizes = args.sizes.split(",") if args.sizes else None
+    results = run(match=args.match, sizes=sizes)
+
+    if args.save:
+        with open(args.save, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+
+        regressions = []
+        for field in ("peak", "deep_size"):
+            regressions += [(f"{name} {field}", old, new, ratio) for name, old, new, ratio in compare(results, baseline, args.threshold, field)]
+
+        for name, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: {old/1024:.1f}KiB -> {new/1024:.1f}KiB ({ratio:.2f}x)")
+
+        if regressions:
+            return 1
+
+        print("no regressions")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Sample pages used by the benchmarks, grouped by size class
+"""
+
+from enwiktionary_sectionparser.synthetic import PageGenerator
+
+SMALL = """\
+==English==
+
+===Noun===
+{{en-noun}}
+
+# {{lb|en|rare}} A [[test]].
+
+[[Category:en:Tests]]
+"""
+
+LANGUAGE = """\
+=={lang}==
+{{{{wikipedia|lang={code}}}}}
+
+===Etymology 1===
+From {{{{inh|{code}|la|testum}}}}, from {{{{der|{code}|grc|τέστον}}}}.<ref>{{{{R:Test|page=12}}}}</ref>
+
+===Pronunciation===
+* {{{{IPA|{code}|/ˈtɛst/}}}}
+* {{{{audio|{code}|LL-Q1860 (eng)-test.wav|Audio}}}}
+* {{{{rhymes|{code}|ɛst|s=1}}}}
+
+====Noun====
+{{{{{code}-noun|m}}}}
+
+# {{{{lb|{code}|countable}}}} A [[procedure]] for critical [[evaluation]]; a means of determining the presence, quality, or truth of something.
+#: {{{{ux|{code}|a '''test''' of one's willpower}}}}
+#* {{{{quote-book|{code}|year=1859|author=w:Charles Dickens|title=A Tale of Two Cities|passage=It was the '''test''' of the age.}}}}
+#* '''1912''', {{{{w|Robert Frost}}}}, ''A Boy's Will'':
+#*: The '''test''' was hard.
+# {{{{lb|{code}|chemistry}}}} A [[reaction]] used to identify a substance.<!-- needs work -->
+## {{{{lb|{code}|specifically}}}} A [[challenge]], [[trial]].
+##: ''They passed the '''test''' easily.''
+##: {{{{syn|{code}|trial|exam}}}}
+# {{{{lb|{code}|cricket}}}} A [[Test match]].
+#: {{{{rfquote-sense|{code}}}}}
+
+=====Synonyms=====
+* {{{{sense|procedure}}}} {{{{l|{code}|examination}}}}, {{{{l|{code}|trial}}}}
+
+=====Derived terms=====
+{{{{col3|{code}|acid test|blood test|crash test|litmus test|screen test|test bed|test case|test drive|test tube}}}}
+
+=====Translations=====
+{{{{trans-top|challenge, trial}}}}
+* French: {{{{t+|fr|épreuve|f}}}}
+* German: {{{{t+|de|Test|m}}}}, {{{{t+|de|Prüfung|f}}}}
+* Spanish: {{{{t+|es|prueba|f}}}}
+{{{{trans-bottom}}}}
+
+====Verb====
+{{{{{code}-verb}}}}
+
+# To [[challenge]].
+#: {{{{uxi|{code}|Testing the limits.}}}}
+# To [[examine]] or [[try]].
+
+===Etymology 2===
+Borrowed from {{{{bor|{code}|fro|test}}}}.
+
+====Noun====
+{{{{{code}-noun}}}}
+
+# {{{{lb|{code}|zoology}}}} The [[shell]] of some [[invertebrate]]s.
+<!--
+===Adjective===
+# commented out
+-->
+
+===References===
+<references/>
+
+===Anagrams===
+* {{{{anagrams|{code}|a=estt|sett|stet}}}}
+
+{{{{C|{code}|Testing}}}}
+[[Category:{code}:Tests]]
+"""
+
+def make_language(lang, code):
+    return LANGUAGE.format(lang=lang, code=code)
+
+TYPICAL = "{{also|Test|tést}}\n" + "\n".join(make_language(lang, code) for lang, code in [
+    ("English", "en"), ("French", "fr"), ("Spanish", "es"),
+])
+
+# Huge pages are generated, with a fixed seed so every run uses the same page
+HUGE, _ = PageGenerator(seed="huge", languages=(20, 20), senses=(5, 30), size=1024*1024).page()
+
+PAGES = {
+    "small": SMALL,
+    "typical": TYPICAL,
+    "huge": HUGE,
+}
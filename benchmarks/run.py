@@ -0,0 +1,151 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark runner
+
+    python -m benchmarks.run                             # run everything
+    python -m benchmarks.run --save baseline.json        # save a baseline
+    python -m benchmarks.run --compare baseline.json     # exit 1 on regressions
+"""
+
+import argparse
+import fnmatch
+import json
+import platform
+import statistics
+import sys
+import time
+
+import enwiktionary_sectionparser
+from .cases import CASES
+from .pages import PAGES
+
+
+def time_case(func, min_time=0.2, min_samples=5, max_samples=1000):
+    """ Returns a list of timings, in seconds, for each call to func """
+    func()
+
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_samples:
+        t = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t)
+
+        if len(samples) >= min_samples and time.perf_counter() - start >= min_time:
+            break
+
+    return samples
+
+def summarize(samples, size):
+    if len(samples) > 1:
+        percentiles = statistics.quantiles(samples, n=100, method="inclusive")
+        p90, p99 = percentiles[89], percentiles[98]
+    else:
+        p90 = p99 = samples[0]
+
+    median = statistics.median(samples)
+    return {
+        "samples": len(samples),
+        "mean": statistics.fmean(samples),
+        "median": median,
+        "p90": p90,
+        "p99": p99,
+        "pages_per_sec": 1/median if median else None,
+        "mb_per_sec": size/median/2**20 if median else None,
+    }
+
+def run(cases=CASES, pages=PAGES, match="*", sizes=None, min_time=0.2, min_samples=5, out=sys.stdout):
+    results = {}
+    for case_name, case in cases.items():
+        for size_name, text in pages.items():
+            name = f"{case_name}/{size_name}"
+            if not fnmatch.fnmatch(name, match) or (sizes and size_name not in sizes):
+                continue
+
+            samples = time_case(case(text), min_time, min_samples)
+            results[name] = summarize(samples, len(text.encode("utf-8")))
+            print(format_result(name, results[name]), file=out)
+
+    return {"meta": meta(), "results": results}
+
+def meta():
+    return {
+        "version": enwiktionary_sectionparser.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def format_result(name, result):
+    return f"{name:32} median {result['median']*1000:10.3f}ms  p90 {result['p90']*1000:10.3f}ms  " \
+           f"p99 {result['p99']*1000:10.3f}ms  {result['pages_per_sec']:10.1f} pages/s  {result['mb_per_sec']:8.2f} MB/s"
+
+def compare(current, baseline, threshold=0.1, field="median"):
+    """
+    Returns a list of (name, baseline value, current value, ratio) for every benchmark
+    where field is more than threshold higher than in the baseline
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+
+        if not old.get(field):
+            continue
+
+        ratio = result[field] / old[field]
+        if ratio > 1 + threshold:
+            regressions.append((name, old[field], result[field], ratio))
+
+    return regressions
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Run the enwiktionary_sectionparser benchmarks")
+    argparser.add_argument("--match", default="*", help="Only run benchmarks matching this glob, eg 'parse/*'")
+    argparser.add_argument("--sizes", help="Comma separated list of page sizes (%s)" % ", ".join(PAGES))
+    argparser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds to run each benchmark")
+    argparser.add_argument("--min-samples", type=int, default=5, help="Minimum number of samples per benchmark")
+    argparser.add_argument("--save", help="Save results to this JSON file")
+    argparser.add_argument("--compare", help="Compare results against this JSON baseline")
+    argparser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown before a benchmark is a regression (default 0.1 = 10%%)")
+    args = argparser.parse_args(argv)
+
+    sizes = args.sizes.split(",") if args.sizes else None
+    results = run(match=args.match, sizes=sizes, min_time=args.min_time, min_samples=args.min_samples)
+
+    if args.save:
+        with open(args.save, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new, ratio in regressions:
+            print(f"REGRESSION {name}: {old*1000:.3f}ms -> {new*1000:.3f}ms ({ratio:.2f}x)")
+
+        if regressions:
+            return 1
+
+        print("no regressions")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
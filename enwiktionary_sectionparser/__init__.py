@@ -7,15 +7,36 @@ A simple parser for English Wiktionary pages
 __version__ = "0.1.0"
 __author__ = 'Jeff Doozan'
 
-from . import sectionparser, posparser
+import collections
+import importlib
+import itertools
+
+from . import sectionparser
 from .sections import ALL_POS
+from .logsink import make_sink, ListSink
 
 SectionParser = sectionparser.SectionParser
 Section = sectionparser.Section
-PosParser = posparser.PosParser
+scan_headings = sectionparser.scan_headings
+heading_paths = sectionparser.heading_paths
+
+# posparser depends on mwparserfromhell, which is slow to import, so it's only
+# imported when PosParser is used
+def __getattr__(name):
+    if name == "PosParser":
+        from .posparser import PosParser
+        return PosParser
+    if name == "posparser":
+        # "from . import posparser" would call __getattr__ again before the module is loaded
+        return importlib.import_module(".posparser", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def parse(text, title, log=None, cache=None, profile=None, previous=None):
+    # Cached results don't include log messages, so the cache is only used when logging is disabled
+    if cache is not None and log is None and previous is None:
+        return cache.parse(text, title)
 
-def parse(text, title, log=None):
-    entry = sectionparser.SectionParser(text, title, log)
+    entry = sectionparser.SectionParser(text, title, log, profile, previous)
 
     # Pages with an unclosed template or html comment are not safe to edit automatically
     # return None *unless* logging has been enabled in which case it is assumed
@@ -25,5 +46,55 @@ def parse(text, title, log=None):
 
     return entry
 
-def parse_pos(section, log=None):
-    return posparser.PosParser(section, log)
+def _parse_chunk(pages, with_log):
+    results = []
+    for text, title in pages:
+        # Records keep the sections, so the caller's sink gets the same arguments
+        log = ListSink(records=True) if with_log else None
+        results.append((parse(text, title, log), log.items if log else None))
+    return results
+
+def parse_many(pages, executor=None, chunksize=64, log=None, prefetch=8):
+    """
+    Lazily yields parse(text, title, log) for every (text, title) in pages
+
+    executor = optional concurrent.futures executor, pages are sent to it in
+               chunks of chunksize pages to amortize the cost of each task
+    prefetch = maximum number of chunks submitted to the executor at once
+    log = list or sink for log messages, messages are logged in page order
+    """
+
+    if executor is None:
+        for text, title in pages:
+            yield parse(text, title, log)
+        return
+
+    sink = make_sink(log)
+    pages = iter(pages)
+    pending = collections.deque()
+    try:
+        while True:
+            while len(pending) < prefetch:
+                chunk = list(itertools.islice(pages, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_parse_chunk, chunk, sink is not None))
+
+            if not pending:
+                break
+
+            for entry, entry_log in pending.popleft().result():
+                if sink is not None:
+                    for record in entry_log:
+                        sink(record.code, record.section, record.line)
+                    if entry:
+                        entry._log = sink
+                yield entry
+
+    finally:
+        for future in pending:
+            future.cancel()
+
+def parse_pos(section, log=None, profile=None, type_cache=None, classifiers=None, lazy=False):
+    from .posparser import PosParser
+    return PosParser(section, log, profile, type_cache, classifiers, lazy)
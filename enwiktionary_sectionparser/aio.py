@@ -0,0 +1,112 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+asyncio interface for parsing pages without blocking the event loop
+
+    async for title, entry in aparse_stream(fetch_pages(), workers=4):
+        ...
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+
+from . import parse
+
+
+async def _aiter(source):
+    if hasattr(source, "__aiter__"):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+
+class ParseStream():
+
+    def __init__(self, source, workers=4, executor=None, max_pending=None, func=parse):
+        """
+        source = async iterable (or iterable) of (text, title)
+        workers = number of worker processes, ignored if executor is provided
+        executor = concurrent.futures executor used to run func
+        max_pending = maximum number of pages being parsed at once, defaults to 2*workers
+                      source is not read while this limit is reached
+        func = callable run for each page as func(text, title), must be picklable
+               when used with a process pool
+        """
+        self._source = source
+        self._executor = executor
+        self._workers = workers
+        self.max_pending = max_pending if max_pending else 2 * workers
+        self.func = func
+
+        self._pending = collections.deque()
+
+    @property
+    def in_flight(self):
+        """ Number of pages submitted to the workers that have not been returned yet """
+        return len(self._pending)
+
+    def __aiter__(self):
+        return self._run()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        executor = self._executor
+        if executor is None:
+            executor = concurrent.futures.ProcessPoolExecutor(self._workers)
+
+        pending = self._pending
+        try:
+            async for text, title in _aiter(self._source):
+                # Return finished pages before waiting on the source again
+                while pending and pending[0][1].done():
+                    title_done, future = pending.popleft()
+                    yield title_done, future.result()
+
+                pending.append((title, loop.run_in_executor(executor, self.func, text, title)))
+
+                while len(pending) >= self.max_pending:
+                    title_done, future = pending[0]
+                    result = await future
+                    pending.popleft()
+                    yield title_done, result
+
+            while pending:
+                title_done, future = pending[0]
+                result = await future
+                pending.popleft()
+                yield title_done, result
+
+        finally:
+            for _, future in pending:
+                future.cancel()
+            pending.clear()
+
+            if self._executor is None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+
+def aparse_stream(source, workers=4, executor=None, max_pending=None, func=parse):
+    """
+    Parses pages from source in a pool of workers, yielding (title, result)
+    in the same order as source, where result is the value of func(text, title)
+
+    See ParseStream for the parameters
+    """
+    return ParseStream(source, workers, executor, max_pending, func)
@@ -0,0 +1,229 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persistent parse cache
+
+Parsed pages are stored in a compact serialized form keyed by a hash of the
+page text and the parser version. Rebuilding a SectionParser from the cache
+skips wiki_splitlines() and Section.add() entirely.
+"""
+
+import hashlib
+import marshal
+import sqlite3
+
+from . import __version__
+from .sectionparser import SectionParser, Section
+
+# Bump whenever the serialized layout changes
+FORMAT_VERSION = 3
+
+# Stored for pages that are not safe to edit, see parse()
+UNSAFE = b""
+
+
+def cache_key(text):
+    key = f"{__version__}:{FORMAT_VERSION}:".encode("utf-8") + text.encode("utf-8")
+    return hashlib.sha1(key).digest()
+
+
+def _dump_section(section):
+    is_topmost = section._topmost is section
+    return (
+        section.level,
+        section.title,
+        section.count,
+        section._content_wikilines,
+        section._leading_empty_lines,
+        section._trailing_empty_lines,
+        section._changes,
+        section._category_lines,
+        section._categories if is_topmost else None,
+        section._toplines if is_topmost else None,
+        section._span,
+        section._offset,
+        [_dump_section(child) for child in section._children],
+    )
+
+def dumps(entry):
+    """ Returns a SectionParser serialized as bytes """
+    data = (entry._content_wikilines, entry._changes, [_dump_section(child) for child in entry._children])
+    return marshal.dumps(data)
+
+
+def _load_section(data, parent):
+    level, title, count, content, leading, trailing, changes, category_lines, categories, toplines, span, offset, children = data
+
+    section = Section.__new__(Section)
+    section.parent = parent
+    section._level = level
+    section._title = title
+    section._count = count
+    section._content_wikilines = content
+    section._leading_empty_lines = leading
+    section._trailing_empty_lines = trailing
+    section._changes = changes
+    if category_lines:
+        section._category_lines = category_lines
+    section._span = span
+    section._offset = offset
+    if categories is not None:
+        section._categories = categories
+        section._toplines = toplines
+        section._topmost = section
+    else:
+        section._topmost = parent._topmost
+
+    section._children = [_load_section(child, section) for child in children]
+    return section
+
+def loads(data, title, log=None, text=None):
+    """
+    Returns a SectionParser created from the output of dumps()
+
+    text = the page text, without it the sections have no span or raw_text
+    """
+    content, changes, children = marshal.loads(data)
+
+    entry = SectionParser.__new__(SectionParser)
+    entry.title = title
+    entry.level = 1
+    entry._state = 0
+    entry._log = log
+    entry._profile = None
+    entry._text = text.replace('\u2029', "") if text is not None else None
+    entry._span = (0, len(entry._text)) if text is not None else None
+    entry._blocks = None
+    entry._changes = changes
+    entry._content_wikilines = content
+    entry._children = [_load_section(child, entry) for child in children]
+    return entry
+
+
+class SqliteCache():
+
+    def __init__(self, filename, max_entries=None, max_bytes=None):
+        """
+        filename = sqlite database, created if it doesn't exist (":memory:" is allowed)
+        max_entries = maximum number of cached pages
+        max_bytes = maximum total size of the cached data
+
+        When either limit is exceeded, the least recently used pages are evicted
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(filename)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key BLOB PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                used INTEGER NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache(used)")
+        self._clock, self._count, self._size = self._db.execute(
+                "SELECT COALESCE(MAX(used), 0), COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size(self):
+        return self._size
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get(self, key):
+        row = self._db.execute("SELECT data FROM cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return
+
+        self.hits += 1
+        # Committed right away, an open write transaction would lock out other connections
+        self._db.execute("UPDATE cache SET used=? WHERE key=?", (self._tick(), key))
+        self._db.commit()
+        return row[0]
+
+    def set(self, key, data):
+        row = self._db.execute("SELECT size FROM cache WHERE key=?", (key,)).fetchone()
+        if row:
+            self._count -= 1
+            self._size -= row[0]
+
+        self._db.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?)", (key, data, len(data), self._tick()))
+        self._count += 1
+        self._size += len(data)
+
+        self.evict()
+        self._db.commit()
+
+    def _over_limit(self):
+        return (self.max_entries is not None and self._count > self.max_entries) \
+            or (self.max_bytes is not None and self._size > self.max_bytes)
+
+    def evict(self):
+        """ Removes the least recently used pages until the cache is within its limits """
+        # Another connection may have changed the table since the totals were read
+        self._count, self._size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        while self._over_limit():
+            rows = self._db.execute("SELECT key, size FROM cache ORDER BY used LIMIT 32").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM cache WHERE key=?", (key,))
+                self._count -= 1
+                self._size -= size
+                if not self._over_limit():
+                    break
+
+    def clear(self):
+        self._db.execute("DELETE FROM cache")
+        self._db.commit()
+        self._count = 0
+        self._size = 0
+
+    def parse(self, text, title):
+        """ Returns the same result as parse(text, title), using the cache when possible """
+        key = cache_key(text)
+        data = self.get(key)
+        if data == UNSAFE:
+            return
+        if data is not None:
+            return loads(data, title, text=text)
+
+        entry = SectionParser(text, title)
+        if entry._state:
+            self.set(key, UNSAFE)
+            return
+
+        self.set(key, dumps(entry))
+        return entry
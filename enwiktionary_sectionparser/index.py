@@ -0,0 +1,177 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Inverted index of the sections on every page of a dump
+
+    with SectionIndex("index.db") as index:
+        index.update(pages)
+        index.titles(language="Spanish", pos="Verb")
+        index.titles(path="Ladino:Etymology 1:Noun")
+
+Paths are formatted like Section.path, the language of a section is the title
+of its L2 section and the POS is the title of any section in sections.ALL_POS.
+Offsets are the index of the heading in the page text.
+"""
+
+import hashlib
+import sqlite3
+
+from .sectionparser import scan_headings, heading_paths
+from .sections import ALL_POS
+
+
+def page_sections(text):
+    """ Yields (path, language, pos, offset) for every section in the page text """
+    headings = scan_headings(text)
+    language = None
+    for (offset, level, title, count), (_, path) in zip(headings, heading_paths(headings)):
+        # Sections before the first L2 don't have a language
+        if level == 2:
+            language = title
+        elif ":" not in path:
+            language = None
+
+        yield path, language, title if title in ALL_POS else None, offset
+
+
+class SectionIndex():
+
+    def __init__(self, filename):
+        """
+        filename = sqlite database, created if it doesn't exist (":memory:" is allowed)
+        """
+        self._db = sqlite3.connect(filename)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                title TEXT UNIQUE NOT NULL,
+                hash BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sections (
+                page INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                language TEXT,
+                pos TEXT,
+                offset INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sections_page ON sections(page);
+            CREATE INDEX IF NOT EXISTS sections_path ON sections(path);
+            CREATE INDEX IF NOT EXISTS sections_language_pos ON sections(language, pos);
+            """)
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def __contains__(self, title):
+        return self._db.execute("SELECT 1 FROM pages WHERE title=?", (title,)).fetchone() is not None
+
+    def _add(self, text, title):
+        page_hash = hashlib.sha1(text.encode("utf-8")).digest()
+        row = self._db.execute("SELECT id, hash FROM pages WHERE title=?", (title,)).fetchone()
+        if row:
+            page_id, old_hash = row
+            if old_hash == page_hash:
+                return False
+            self._db.execute("DELETE FROM sections WHERE page=?", (page_id,))
+            self._db.execute("UPDATE pages SET hash=? WHERE id=?", (page_hash, page_id))
+        else:
+            page_id = self._db.execute("INSERT INTO pages (title, hash) VALUES (?,?)", (title, page_hash)).lastrowid
+
+        self._db.executemany("INSERT INTO sections VALUES (?,?,?,?,?)",
+                ((page_id, path, language, pos, offset) for path, language, pos, offset in page_sections(text)))
+        return True
+
+    def add(self, text, title):
+        """ Indexes a page, replacing any older version. Returns False if the page was unchanged """
+        changed = self._add(text, title)
+        self._db.commit()
+        return changed
+
+    def _remove(self, title):
+        row = self._db.execute("SELECT id FROM pages WHERE title=?", (title,)).fetchone()
+        if row:
+            self._db.execute("DELETE FROM sections WHERE page=?", row)
+            self._db.execute("DELETE FROM pages WHERE id=?", row)
+
+    def remove(self, title):
+        self._remove(title)
+        self._db.commit()
+
+    def update(self, pages, remove_missing=False):
+        """
+        Indexes every (text, title) in pages, pages that haven't changed since they
+        were last indexed are skipped. Returns the number of pages that were added or changed
+
+        remove_missing = remove any indexed pages that are not in pages, use when
+                         updating from a complete dump
+        """
+        changed = 0
+        seen = set()
+        for text, title in pages:
+            if remove_missing:
+                seen.add(title)
+            if self._add(text, title):
+                changed += 1
+
+        if remove_missing:
+            for title, in self._db.execute("SELECT title FROM pages").fetchall():
+                if title not in seen:
+                    self._remove(title)
+
+        self._db.commit()
+        return changed
+
+    def _where(self, language, pos, path):
+        clauses = []
+        params = []
+        for column, value in (("language", language), ("pos", pos), ("path", path)):
+            if value is not None:
+                clauses.append(f"{column}=?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def find(self, language=None, pos=None, path=None):
+        """ Returns a list of (title, path, offset) for every section matching all of the given values """
+        where, params = self._where(language, pos, path)
+        return self._db.execute("SELECT title, path, offset FROM sections JOIN pages ON pages.id=sections.page"
+                + where + " ORDER BY title, offset", params).fetchall()
+
+    def titles(self, language=None, pos=None, path=None):
+        """ Returns a sorted list of the pages with a section matching all of the given values """
+        where, params = self._where(language, pos, path)
+        return [title for title, in self._db.execute("SELECT DISTINCT title FROM sections JOIN pages ON pages.id=sections.page"
+                + where + " ORDER BY title", params)]
+
+    def languages(self):
+        """ Returns a list of (language, number of pages) """
+        return self._db.execute("SELECT language, COUNT(DISTINCT page) FROM sections WHERE language IS NOT NULL"
+                " GROUP BY language ORDER BY language").fetchall()
+
+
+def build_index(filename, pages, remove_missing=False):
+    """ Creates or updates the index in filename from an iterable of (text, title) """
+    with SectionIndex(filename) as index:
+        index.update(pages, remove_missing)
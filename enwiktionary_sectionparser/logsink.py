@@ -0,0 +1,155 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Log sinks for parser messages
+
+A sink is any callable that accepts (code, section, line), where section is
+the Section (or SectionParser) the message applies to. Sinks receive the
+section itself, the path is only formatted if the sink asks for it.
+
+Passing a list as the log to the parsers wraps it with ListSink, which
+appends a (code, path, line) tuple for each message. ListSink and
+RingBufferSink keep LogRecord objects instead when records=True. Records
+format the path when it's read and keep the section alive.
+"""
+
+import collections
+
+
+class LogRecord():
+
+    __slots__ = ("code", "section", "line")
+
+    def __init__(self, code, section, line):
+        self.code = code
+        self.section = section
+        self.line = line
+
+    @property
+    def path(self):
+        """ The page and section titles joined with : eg. test:English:Noun """
+        return ":".join(reversed(list(self.section.lineage)))
+
+    @property
+    def span(self):
+        """ (start, end) offsets of the line in the page text, or None if they are not known """
+        raw_text = getattr(self.section, "raw_text", None)
+        if not raw_text or not isinstance(self.line, str):
+            return
+
+        idx = raw_text.find(self.line)
+        if idx < 0:
+            return
+
+        start = self.section.span[0] + idx
+        return start, start + len(self.line)
+
+    # Records behave like (code, path, line) tuples
+    def _as_tuple(self):
+        return (self.code, self.path, self.line)
+
+    def __iter__(self):
+        return iter(self._as_tuple())
+
+    def __getitem__(self, idx):
+        return self._as_tuple()[idx]
+
+    def __len__(self):
+        return 3
+
+    def __eq__(self, other):
+        if isinstance(other, (LogRecord, tuple)):
+            return self._as_tuple() == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._as_tuple())
+
+    def __repr__(self):
+        return repr(self._as_tuple())
+
+
+def _tuple(code, section, line):
+    return (code, ":".join(reversed(list(section.lineage))), line)
+
+
+class ListSink():
+
+    def __init__(self, items=None, records=False):
+        """
+        items = list that receives the messages
+        records = append LogRecord objects instead of (code, path, line) tuples
+        """
+        self.items = [] if items is None else items
+        self._make = LogRecord if records else _tuple
+
+    def __call__(self, code, section, line):
+        self.items.append(self._make(code, section, line))
+
+
+class CountingSink():
+    """ Counts messages by code, without keeping the messages """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def __call__(self, code, section, line):
+        self.counts[code] += 1
+
+
+class SamplingSink():
+    """ Forwards a random sample of messages to another sink """
+
+    def __init__(self, sink, rate, seed=None):
+        """
+        sink = sink or list that receives the sampled messages
+        rate = fraction of messages to keep, between 0 and 1
+        """
+        self.sink = make_sink(sink)
+        self.rate = rate
+
+        import random
+        self._random = random.Random(seed)
+
+    def __call__(self, code, section, line):
+        if self._random.random() < self.rate:
+            self.sink(code, section, line)
+
+
+class RingBufferSink():
+    """ Keeps only the most recent maxlen messages """
+
+    def __init__(self, maxlen=1000, records=False):
+        """
+        maxlen = number of messages to keep
+        records = keep LogRecord objects instead of (code, path, line) tuples
+        """
+        self.items = collections.deque(maxlen=maxlen)
+        self._make = LogRecord if records else _tuple
+
+    def __call__(self, code, section, line):
+        self.items.append(self._make(code, section, line))
+
+
+def make_sink(log):
+    """ Returns a sink for the log parameter accepted by the parsers """
+    if log is None:
+        return
+    if isinstance(log, list):
+        return ListSink(log)
+    if not callable(log):
+        raise ValueError("log must be a list or a callable sink", log)
+    return log
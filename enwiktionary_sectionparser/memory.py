@@ -0,0 +1,113 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Memory footprint of parsed pages
+
+    report = memory_report(entry)
+    print(report.total, report.ratio(text))
+    print(report.format())
+"""
+
+import collections
+import sys
+import types
+
+# Shared objects that should never be counted as part of a page
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+class MemoryReport():
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.sizes = collections.Counter()
+
+    def add(self, kind, size):
+        self.counts[kind] += 1
+        self.sizes[kind] += size
+
+    @property
+    def total(self):
+        return sum(self.sizes.values())
+
+    def ratio(self, text):
+        """ Returns the size of the parsed objects relative to the size of the input text """
+        return self.total / sys.getsizeof(text)
+
+    def format(self):
+        lines = [f"{'kind':24} {'count':>10} {'bytes':>12}"]
+        for kind, size in self.sizes.most_common():
+            lines.append(f"{kind:24} {self.counts[kind]:10} {size:12}")
+        lines.append(f"{'total':24} {sum(self.counts.values()):10} {self.total:12}")
+        return "\n".join(lines)
+
+
+def _walk(objects, seen):
+    """ Yields every object reachable from objects that isn't in seen, adding them to seen """
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SKIP_TYPES) or obj is None:
+            continue
+        seen.add(id(obj))
+        yield obj
+
+        if isinstance(obj, (str, bytes, int, float, bool)):
+            continue
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+            continue
+
+        if isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+            stack.extend(obj)
+            continue
+
+        obj_dict = getattr(obj, "__dict__", None)
+        if obj_dict is not None and id(obj_dict) not in seen:
+            stack.append(obj_dict)
+
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+
+def memory_report(*objects, exclude=()):
+    """
+    Returns a MemoryReport with the deep size of the given objects, broken down by type
+
+    Every object is counted once, even if it is referenced from multiple places.
+    Instance dicts are reported as Class.__dict__
+
+    exclude = objects that should not be counted, along with everything reachable
+              from them, eg. to measure a PosParser without the page it was created
+              from pass exclude=[entry]
+    """
+    report = MemoryReport()
+    seen = set()
+    for _ in _walk(exclude, seen):
+        pass
+
+    owners = {}
+    for obj in _walk(objects, seen):
+        obj_dict = getattr(obj, "__dict__", None)
+        if obj_dict is not None and not isinstance(obj, type):
+            owners[id(obj_dict)] = type(obj).__name__ + ".__dict__"
+        kind = owners.get(id(obj)) if isinstance(obj, dict) else None
+        report.add(kind or type(obj).__name__, sys.getsizeof(obj))
+
+    return report
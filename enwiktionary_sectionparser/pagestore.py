@@ -0,0 +1,204 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Flat file page store with a sorted title index, for random access to pages by title
+
+Page texts are written back-to-back into a single data file, the index is written
+to a separate file (data file + ".idx") with the layout
+
+    header:  MAGIC, entry count
+    entries: (title offset, title length, page offset, page length) sorted by title
+    titles:  utf-8 encoded titles
+
+Both files are memory mapped by PageStore so lookups only touch the pages
+of the files that are needed and the OS page cache is shared between all
+processes reading the same store.
+"""
+
+import mmap
+import os
+import struct
+
+from . import parse
+
+MAGIC = b"WKPSTOR1"
+HEADER = struct.Struct("<8sQ")
+ENTRY = struct.Struct("<QIQQ")
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+class PageStoreWriter():
+
+    def __init__(self, path):
+        """
+        path = filename of the data file, the index is written to path + ".idx"
+        """
+        self.path = path
+        self._data = open(path, "wb")
+        self._offset = 0
+        self._pages = {}
+
+    def add(self, title, text):
+        """ Adds a page to the store, if title already exists the newest text wins """
+        data = text.encode("utf-8")
+        self._data.write(data)
+        self._pages[title.encode("utf-8")] = (self._offset, len(data))
+        self._offset += len(data)
+
+    def close(self):
+        if self._data is None:
+            return
+        self._data.close()
+        self._data = None
+
+        titles = sorted(self._pages)
+        with open(index_path(self.path), "wb") as outfile:
+            outfile.write(HEADER.pack(MAGIC, len(titles)))
+            title_offset = HEADER.size + ENTRY.size * len(titles)
+            for title in titles:
+                offset, length = self._pages[title]
+                outfile.write(ENTRY.pack(title_offset, len(title), offset, length))
+                title_offset += len(title)
+            for title in titles:
+                outfile.write(title)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_pagestore(path, pages):
+    """
+    path = filename of the data file
+    pages = iterable of (title, text)
+    """
+    with PageStoreWriter(path) as writer:
+        for title, text in pages:
+            writer.add(title, text)
+
+
+def _mmap_file(filename):
+    with open(filename, "rb") as infile:
+        if not os.fstat(infile.fileno()).st_size:
+            return b""
+        return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PageStore():
+
+    def __init__(self, path):
+        """
+        path = filename of a data file created by PageStoreWriter
+        """
+        self.path = path
+        self._open()
+
+    def _open(self):
+        self._index = _mmap_file(index_path(self.path))
+        magic, self._count = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path(self.path)} is not a page store index")
+        self._data = _mmap_file(self.path)
+
+    def close(self):
+        for item in (self._index, self._data):
+            if isinstance(item, mmap.mmap):
+                item.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # mmaps can't be pickled, re-open the files when sent to another process
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self._open()
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, idx):
+        return ENTRY.unpack_from(self._index, HEADER.size + idx * ENTRY.size)
+
+    def _title(self, idx):
+        title_offset, title_length, _, _ = self._entry(idx)
+        return self._index[title_offset:title_offset+title_length]
+
+    def _find(self, title):
+        key = title.encode("utf-8")
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._title(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < self._count and self._title(lo) == key:
+            return lo
+
+    def __contains__(self, title):
+        return self._find(title) is not None
+
+    def get_span(self, title):
+        """ Returns (offset, length) of the page in the data file or None """
+        idx = self._find(title)
+        if idx is None:
+            return
+        _, _, offset, length = self._entry(idx)
+        return offset, length
+
+    def get(self, title, default=None):
+        span = self.get_span(title)
+        if span is None:
+            return default
+        offset, length = span
+        return self._data[offset:offset+length].decode("utf-8")
+
+    def __getitem__(self, title):
+        text = self.get(title)
+        if text is None:
+            raise KeyError(title)
+        return text
+
+    def parse(self, title, log=None):
+        """
+        Returns a SectionParser for the given title or None if the
+        title doesn't exist or the page isn't safe to edit (see parse())
+        """
+        text = self.get(title)
+        if text is None:
+            return
+        return parse(text, title, log)
+
+    def titles(self):
+        """ Yields all titles in sorted order """
+        for idx in range(self._count):
+            yield self._title(idx).decode("utf-8")
+
+    def __iter__(self):
+        return self.titles()
@@ -13,8 +13,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
+import functools
 import re
-import mwparserfromhell as mwparser
+import threading
+from .profiling import perf_counter, timed
+from .logsink import make_sink
+from .utils import scan_templates
 
 
 class PosParser():
@@ -29,14 +34,13 @@ class PosParser():
         "mero": [ "mero", "meronyms", "mer" ],
         "tropo": [ "troponyms", ],
         "comero": [ "comeronyms", ],
-        "cot": [ "cot", "coordinate terms", "coordinate_terms", ],
+        "cot": [ "cot", "coord", "coordinate terms", "coordinate_terms", "coord-lite", ],
         "parasyn": [ "nearsyn", "parasynonyms", "parasyn", "par", "near-syn", "near-synonyms" ],
         "perfect": [ "perfectives", ],
         "imperfect": [ "imperfectives" ],
         "active": [ "active-voice", ],
         "midvoice": [ "middle-voice", ],
         "co": [ "co", "coi", "collocation", "coa", "zh-co", ],
-        "cot": [ "cot", "coord", "coordinate terms", "coord-lite", ],
         "ux": [ "ux", "usex", "uxi", "ux-lite", "uxa", "prefex", "prefixusex", "afex", "sufex", "suffixusex", "afex", "affixusex" ] \
             + sum([[k + "-x", k + "-x-inline", k + "-usex", k + "-usex-inline"] for k in ["ja", "hi", "ko", "th", "ur", "zh", "km", "ne", "ryu"]], []),
         "quote": [ "Q", "quote", "quotei", "quote-book", "quote-web", "quote-text", "quote-journal", "quote-av",
@@ -55,32 +59,36 @@ class PosParser():
 
     ALL_NYMS = [ "syn", "ant", "hyper", "hypo", "holo", "merq", "tropo", "comero", "cot", "parasyn", "perfect", "imperfect", "active", "midvoice", "alti" ]
 
-    all_templates = []
-    template_to_type = {}
-    for k, templates in TYPE_TO_TEMPLATES.items():
-        all_templates += templates
-        for template in templates:
-            template_to_type[template] = k
-
-    ALL_TYPE_TEMPLATES = "|".join(sorted(set(all_templates)))
-    TEMPLATE_PATTERN = r"\{\{\s*(?P<t>" + ALL_TYPE_TEMPLATES + r")\s*\|"
-    re_templates = re.compile(TEMPLATE_PATTERN)
-    #print(all_templates)
-    #print(TYPE_PATTERN)
-    #exit()
-
-    def __init__(self, section, log=None):
+    def __init__(self, section, log=None, profile=None, type_cache=None, classifiers=None, lazy=False):
         """
         section = enwiktionary_sectionparser.Section
-        log = list to append log messages
+        log = list to append log messages or a sink, see logsink
+        profile = optional profiling.Profile to collect timings
+        type_cache = ItemTypeCache to use instead of ITEM_TYPE_CACHE, False to disable caching
+        classifiers = ItemClassifiers to use instead of CLASSIFIERS
+        lazy = only split the headlines, senses and footlines, the senses, their children
+               and their types are created the first time they're used
         """
-        self._log = log
+        self._log = make_sink(log)
         self._changes = []
         self._section = section
-
-        self.headlines, self.senses, self.footlines = self.parse(section)
-
-        if self.headlines and self.senses:
+        self._profile = profile
+        # The shared cache and classifiers are looked up when used, so that they're not
+        # counted in a memory_report() of the parser
+        self._classifiers = classifiers
+        self._type_cache = type_cache
+        self._lazy = lazy
+        self._new_item = functools.partial(LazyListItem, self) if lazy else ListItem
+        self._pending_senses = None
+
+        if profile:
+            start = perf_counter()
+
+        self.headlines, senses, self.footlines = self.parse(section)
+        if senses is not None:
+            self.senses = senses
+
+        if self.headlines and (senses or self._pending_senses):
             empty_count = sum(1 for l in self.headlines if l.strip() == "")
 
             trailing_empty = 0
@@ -98,30 +106,93 @@ class PosParser():
             elif trailing_empty > 1:
                 self._changes.append("one empty line between header and senses per [[WT:NORM]]")
 
+        if profile:
+            profile.add("pos", perf_counter() - start)
+
     def log(self, error, section, line):
         if self._log is None:
             return
-        lineage = list(section.lineage) if section else [ self.title, "" ]
-        page = lineage.pop()
-        path = ":".join(reversed(lineage))
-        self._log.append((error, path, line))
+        self._log(error, section if section else self._section, line)
 
     @property
     def section(self):
         return self._section
 
+    def __getattr__(self, name):
+        # In lazy mode, senses is created on first use
+        if name == "senses" and self._pending_senses is not None:
+            self.senses = [self._get_sense(idx) for idx in range(len(self._pending_senses))]
+            return self.senses
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def iter_senses(self):
+        """ Yields the top level senses, in lazy mode each sense is created when it's reached """
+        if "senses" in self.__dict__ or self._pending_senses is None:
+            yield from self.senses
+            return
+
+        for idx in range(len(self._pending_senses)):
+            yield self._get_sense(idx)
+
     @property
     def changelog(self):
+        changes = self._changes
+        if self._pending_senses is not None:
+            # Changes to the list are found while the senses are created, keep them in page order
+            changes = []
+            for idx, sense in enumerate(self.iter_senses()):
+                self._build_children(sense)
+                changes += self._pending_senses[idx][2]
+            changes += self._changes
+
         summary = []
-        for item in self._changes:
+        for item in changes:
             if item not in summary:
                 summary.append(item)
         return "; ".join(summary)
 
+    def span(self, item):
+        """
+        Returns the (start, end) offsets of item and its subitems in the page text, or
+        None if the item, its subitems or the section were modified
+        """
+        line_spans = self._section.line_spans()
+        if line_spans is None or item._line is None:
+            return
+
+        items = []
+        stack = [item]
+        while stack:
+            node = stack.pop()
+            items.append(node)
+            stack.extend(reversed(node._children))
+
+        last_line = items[-1]._line
+        if last_line is None or last_line >= len(line_spans):
+            return
+
+        # The lines must still produce the same items, empty lines and items are skipped by parse_list()
+        lines = []
+        for line in self._section._content_wikilines[item._line:last_line+1]:
+            m = re.match(r'([#:*]+)(\s*)(.*)(\s*)', line, flags=re.DOTALL)
+            if m and m.group(3):
+                lines.append((m.group(1), m.group(3)))
+        if lines != [(node.prefix, node.data) for node in items]:
+            return
+
+        return line_spans[item._line][0], line_spans[last_line][1]
+
+    def raw_text(self, item):
+        """ Returns the text of item and its subitems as it appears in the page, or None if it was modified """
+        span = self.span(item)
+        if span:
+            return self._section._page_text()[span[0]:span[1]]
+
 
     def parse(self, section):
 
-        wikilines = section.content_wikilines
+        # Read without taking the list, which would count as a modification of the section
+        wikilines = section._content_wikilines
 
         first_sense = 0
         while first_sense<len(wikilines) and (not wikilines[first_sense] or wikilines[first_sense][0] not in "*#:"):
@@ -131,41 +202,81 @@ class PosParser():
         while last_sense > first_sense and (not wikilines[last_sense].strip() or wikilines[last_sense][0] not in "*#:"):
             last_sense -= 1
 
-        sense_list = self.parse_list(wikilines[first_sense:last_sense+1], section)
+        if self._lazy:
+            pending = self._scan_senses(wikilines[first_sense:last_sense+1], first_sense)
+            # Lists with unexpected lines are left to parse_list(), as are lists
+            # where every item is empty so that their removal is logged
+            if pending:
+                self._pending_senses = pending
+                self._sense_lines = wikilines[first_sense:last_sense+1]
+                self._first_sense = first_sense
+                return wikilines[:first_sense], None, wikilines[last_sense+1:]
+
+        profile = self._profile
+        if profile:
+            sense_list = timed(profile, "pos.parse_list", self.parse_list, wikilines[first_sense:last_sense+1], section, first_sense)
+        else:
+            sense_list = self.parse_list(wikilines[first_sense:last_sense+1], section, first_sense)
         if not sense_list:
             # TODO Better error handling here
-            return wikilines, [], []
+            return wikilines[:], [], []
 
-        self.set_item_types(sense_list)
+        if profile:
+            timed(profile, "pos.set_item_types", self.set_item_types, sense_list)
+        else:
+            self.set_item_types(sense_list)
 
         return wikilines[:first_sense], sense_list, wikilines[last_sense+1:]
 
 
-    def parse_list(self, all_items, section):
-        list_items = []
+    def _split_item(self, line, changes):
+        # Returns (prefix, data) for a list item, None for lines that are removed
+        # or False if the line isn't a list item
+        if not line.strip():
+            changes.append("removed newline in list")
+            return
 
-        prev_item = None
-        prev_level = None
+        m = re.match(r'([#:*]+)(\s*)(.*)(\s*)', line, flags=re.DOTALL)
+        if not m:
+            return False
 
-        for line in all_items:
-            if not line.strip():
-                self._changes.append("removed newline in list")
-                continue
+        prefix = m.group(1)
+        space = m.group(2)
+        data = m.group(3)
+        trailing_space = m.group(4)
 
-            m = re.match(r'([#:*]+)(\s*)(.*)(\s*)', line, flags=re.DOTALL)
-            if not m:
-#                print("FAILED processing list, found non_list_item", section.path, line)
-                return
+        if not data:
+            changes.append("removed empty item")
+            return
+
+        if space != " ":
+            changes.append("one space between format and line data per [[WT:NORM]]")
+
+        if trailing_space:
+            changes.append("remove trailing spaces per [[WT:NORM]]")
+
+        return prefix, data
+
+    def parse_list(self, all_items, section, first_line=0, root=None, changes=None):
+        # first_line = index of all_items[0] in section.content_wikilines
+        # root = item that all of the lines are subitems of
+        # changes = list to append changes, defaults to the parser's changes
+        if changes is None:
+            changes = self._changes
 
-            prefix = m.group(1)
-            space = m.group(2)
-            data = m.group(3)
-            trailing_space = m.group(4)
+        list_items = []
+
+        prev_item = root
 
-            if not data:
-                self._changes.append("removed empty item")
+        for line_idx, line in enumerate(all_items, first_line):
+            res = self._split_item(line, changes)
+            if res is False:
+#                print("FAILED processing list, found non_list_item", section.path, line)
+                return
+            if res is None:
                 continue
 
+            prefix, data = res
             level = len(prefix)
             style = prefix[-1]
 
@@ -186,13 +297,8 @@ class PosParser():
                 idx = len(list_items)
                 name = style + str(idx+1)
 
-            if space != " ":
-                self._changes.append("one space between format and line data per [[WT:NORM]]")
-
-            if trailing_space:
-                self._changes.append("remove trailing spaces per [[WT:NORM]]")
-
-            item = ListItem(parent, prefix, data, name)
+            item = self._new_item(parent, prefix, data, name)
+            item._line = line_idx
             if parent:
                 parent._children.append(item)
             else:
@@ -202,70 +308,99 @@ class PosParser():
 
         return list_items
 
-    def set_item_types(self, items):
+    def _scan_senses(self, lines, first_line):
+        # Returns a list of [start, end, changes, sense] with the line range of each top level sense,
+        # or None if any line isn't a list item
+        starts = []
+        top_level = None
+        for line_idx, line in enumerate(lines, first_line):
+            if not line.strip():
+                continue
+            data = line.lstrip("#:*")
+            level = len(line) - len(data)
+            if not level:
+                return
+            # Empty items are removed by parse_list()
+            if not data.strip():
+                continue
+            if top_level is None or level <= top_level:
+                starts.append(line_idx)
+                top_level = level
+
+        if not starts:
+            return []
+
+        # Removed lines before the first sense belong to the first sense
+        starts[0] = first_line
+        ends = starts[1:] + [first_line + len(lines)]
+        return [[start, end, [], None] for start, end in zip(starts, ends)]
+
+    def _get_sense(self, idx):
+        # Returns the top level sense idx, without its children, creating it if needed
+        pending = self._pending_senses[idx]
+        if pending[3]:
+            return pending[3]
+
+        start, end, changes, _ = pending
+        offset = self._first_sense
+        for line_idx in range(start, end):
+            res = self._split_item(self._sense_lines[line_idx-offset], changes)
+            if res:
+                break
+
+        prefix, data = res
+        item = self._new_item(None, prefix, data, prefix[-1] + str(idx+1))
+        item._line = line_idx
+        item._pending = (line_idx+1, end, changes)
+        del item._children
+        pending[3] = item
+        return item
+
+    def _build_children(self, item):
+        # Creates the subitems of a lazy top level sense
+        if "_children" in item.__dict__:
+            return
 
-        for item in items:
+        start, end, changes = item._pending
+        offset = self._first_sense
+        item._children = []
+        self.parse_list(self._sense_lines[start-offset:end-offset], self._section, start, item, changes)
+        del item._pending
 
-            template_types = []
-            is_single_template = False
-            if "{{" in item.data:
-                wiki = mwparser.parse(item.data)
-                first_template = None
-                for t in wiki.ifilter_templates(recursive=False):
-                    template_type = self.template_to_type.get(t.name.strip())
-                    if template_type:
-                        template_types.append(template_type)
-
-                        if not first_template:
-                            first_template = t
-
-                if first_template:
-                    # Strip html comments before checking that text is a single template
-                    text = strip_safe_templates(wiki)
-                    text = strip_html_comments(item.data)
-                    # TODO: Strip categories
-                    text = strip_ref_tags(text)
-
-                    template_text = str(first_template)
-                    template_text = strip_html_comments(template_text)
-                    template_text = strip_ref_tags(template_text)
-
-                    is_single_template = template_text.strip() == text.strip()
-#                    print([template_text, text])
-
-            if template_types:
-                if not all(t == template_types[0] for t in template_types):
-                    item._type = "bad"
-                else:
-                    template_type = template_types[0]
-
-                    if template_type != "sense" and not is_single_template:
-                        item._type = "bad"
-
-                    # "zh-x" may be a quote or a ux, depending on the existence of a "ref=" parameter
-                    elif first_template.name == "zh-x" and first_template.has("ref"):
-                        item._type = "quote"
-
-                    else:
-                        item._type = template_type
+    def _set_sibling_types(self, item):
+        # Sets the types of a lazy item and its siblings
+        self._set_types(item.parent._children if item.parent else self.senses)
 
-            else:
-                # RQ: templates are quotes
-                if re.match(r"\s*{{\s*(R|RQ):", item.data):
-                    item._type = "quote"
+    def set_item_types(self, items):
 
-                elif is_bare_quote(item):
-                    item._type = "bare_quote"
+        self._set_types(items)
 
-                elif is_bare_uxi(item):
-                    item._type = "bare_uxi"
+        for item in items:
+            if item._children:
+                self.set_item_types(item._children)
 
-                elif is_bare_ux(item):
-                    item._type = "bare_ux"
+    def _set_types(self, items):
 
-                else:
-                    item._type = "unknown"
+        cache = self._type_cache
+        if cache is None:
+            cache = ITEM_TYPE_CACHE
+        if cache is not False:
+            # Cached types are only valid for the classifiers that were used to find them
+            classifiers = self._classifiers if self._classifiers is not None else CLASSIFIERS
+            token = classifiers.compile()[0]
+
+        for item in items:
+            data_key = _item_key(item, cache.maxlen) if cache is not False else None
+            if data_key is None:
+                item._type = self.get_item_type(item)
+                continue
 
+            key = (token, data_key)
+            item_type = cache.get(key)
+            if item_type is None:
+                item_type = self.get_item_type(item)
+                cache.set(key, item_type)
+            item._type = item_type
 
         # Special handling for top level senses and
         # "sense" parents, "senses" whose children are all subsenses
@@ -280,16 +415,139 @@ class PosParser():
             if i._type == "bad":
                 i._type = "unknown"
 
-        for item in items:
-            if item._children:
-                self.set_item_types(item._children)
+    def get_item_type(self, item):
+        """ Returns the type of a list item, based only on its data and its children """
+
+        profile = self._profile
+        classifiers = self._classifiers if self._classifiers is not None else CLASSIFIERS
+        template_types = []
+        is_single_template = False
+        if "{{" in item.data:
+            templates = timed(profile, "pos.set_item_types.templates", top_templates, item.data) if profile else top_templates(item.data)
+            first_template = None
+            for t in templates:
+                template_type = classifiers.template_type(t)
+                if template_type:
+                    template_types.append(template_type)
+
+                    if not first_template:
+                        first_template = t
+
+            if first_template:
+                # Strip html comments before checking that text is a single template
+                text = strip_html_comments(item.data)
+                # TODO: Strip categories
+                text = strip_ref_tags(text)
+
+                template_text = str(first_template)
+                template_text = strip_html_comments(template_text)
+                template_text = strip_ref_tags(template_text)
+
+                is_single_template = template_text.strip() == text.strip()
+
+        if template_types:
+            if not all(t == template_types[0] for t in template_types):
+                return "bad"
+            else:
+                template_type = template_types[0]
+
+                if template_type != "sense" and not is_single_template:
+                    return "bad"
+
+                return template_type
+
+        else:
+            if profile:
+                start = perf_counter()
 
+            item_type = classifiers.heuristic_type(item)
 
+            if profile:
+                profile.add("pos.set_item_types.heuristics", perf_counter() - start)
+
+            return item_type
 
     def __str__(self):
         return "\n".join(map(str, self.headlines + [""] + self.senses + self.footlines))
 
 
+class ItemTypeCache():
+
+    def __init__(self, maxsize=2**16, maxlen=256):
+        """
+        Thread safe LRU cache of list item types, keyed by _item_key()
+
+        maxsize = maximum number of cached items
+        maxlen = items with longer data, or a longer first child, are not cached
+        """
+        self.maxsize = maxsize
+        self.maxlen = maxlen
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return
+            self.hits += 1
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Shared by every PosParser unless another cache is given
+ITEM_TYPE_CACHE = ItemTypeCache()
+
+def _item_key(item, maxlen):
+    # Everything PosParser.get_item_type() looks at: the item data and, for is_bare_ux(),
+    # the number of children and the first child, or None if the key would be too long
+    if len(item.data) > maxlen:
+        return
+    children = item._children
+    if not children:
+        return item.data
+    if len(children[0].data) > maxlen:
+        return
+    return (item.data, len(children), children[0].data, bool(children[0]._children))
+
+def mwparse(text):
+    """ mwparserfromhell.parse(), mwparserfromhell is slow to import so it's only loaded when needed """
+    import mwparserfromhell
+    return mwparserfromhell.parse(text)
+
+def top_templates(text):
+    """
+    Returns a list of the top level templates in text, using scan_templates() when
+    possible and mwparserfromhell when the markup is too complex for it
+    """
+    templates = scan_templates(text)
+    if templates is None:
+        return list(mwparse(text).ifilter_templates(recursive=False))
+    return templates
+
 def strip_html_comments(text):
     return re.sub(r"\s*<!--.*?-->", "", text, flags=re.DOTALL)
 
@@ -298,55 +556,117 @@ def strip_ref_tags(text):
 
 
 SAFE_TEMPLATES = ["att", "attn", "attention", "C", "c", "top", "topic", "anchor"]
-def strip_safe_templates(wiki):
-    text = str(wiki)
-    to_remove = [str(t) for t in wiki.ifilter_templates() if t.name in SAFE_TEMPLATES]
+def strip_safe_templates(text):
+    templates = scan_templates(text, recursive=True)
+    if templates is None:
+        templates = mwparse(text).ifilter_templates()
+    to_remove = [str(t) for t in templates if t.name in SAFE_TEMPLATES]
     for old in to_remove:
         text = text.replace(old, "")
     return text
 
+def is_template(name, text):
+    """ Returns True if text is a single template called name, with nothing before or after it """
+    templates = scan_templates(text)
+    if templates is None:
+        nodes = mwparse(text).nodes
+        return len(nodes) == 1 and hasattr(nodes[0], "params") and nodes[0].name.strip() == name
+    return len(templates) == 1 and str(templates[0]) == text and templates[0].name.strip() == name
+
 def has_link(text):
     return bool(re.search(r"(\[\[[^\[\]]+\]\]|{{\s*(l|m)\s*\|)", text))
 
+_WIKILINK_RX = re.compile(r"\[\[(?:[^\[\]]*[|])?(.*?)\]\]")
 def strip_wikilinks(text):
     # just good enough for use by is_sentence
-    return re.sub(r"\[\[(?:[^\[\]]*[|])?(.*?)\]\]", r"\1", text)
+    if "[[" not in text:
+        return text
+    return _WIKILINK_RX.sub(r"\1", text)
 
+_TEMPLATE_LINK_RX = re.compile(r"{{(?:l|m)[|].*?[|](.*?)}}")
 def strip_template_links(text):
     # only good enough for use by is_sentence
-    return re.sub(r"{{(?:l|m)[|].*?[|](.*?)}}", r"\1", text)
+    if "{{" not in text:
+        return text
+    return _TEMPLATE_LINK_RX.sub(r"\1", text)
 
+_SENTENCE_RX = re.compile(r"""^\W*[A-Z].*[.?!]["'\W]*$""")
+_SENTENCE_END_RX = re.compile(r"[.?!]")
 def is_sentence(text):
+    # Stripping links never adds punctuation, so text without any can't be a sentence
+    if not _SENTENCE_END_RX.search(text):
+        return False
     text = strip_wikilinks(text)
     text = strip_template_links(text)
-    return bool(re.match(r"""^\W*[A-Z].*[.?!]["'\W]*$""", text))
+    return bool(_SENTENCE_RX.match(text))
 
+_ITALIC = "(?<!')(?:'{2}|'{5})(?!')"
+_ITALIC_RX = re.compile(_ITALIC)
+_ITALIC_WRAP_RX = re.compile(fr"{_ITALIC}.*{_ITALIC}$")
 def is_italic(text):
     # Returns True if entire string is enclosed in '' italic wikimarkup
-    ital = "(?<!')(?:'{2}|'{5})(?!')"
-    return re.match(fr"{ital}.*{ital}$", text) and not re.search(ital, text[2:-2])
+    if not text.startswith("''") or not text.endswith(("''", "''\n")):
+        return False
+    return bool(_ITALIC_WRAP_RX.match(text)) and not _ITALIC_RX.search(text[2:-2])
 
+_BOLD = "(?<!')(?:'{3}|'{5})(?!')"
+_BOLD_RX = re.compile(_BOLD)
+_BOLD_WRAP_RX = re.compile(fr"{_BOLD}.*{_BOLD}$")
 def is_bold(text):
     # Returns True if entire string is enclosed in ''' bold wikimarkup
-    bold = "(?<!')(?:'{3}|'{5})(?!')"
-    return re.match(fr"{bold}.*{bold}$", text) and not re.search(bold, text[3:-3])
+    if not text.startswith("'''") or not text.endswith(("'''", "'''\n")):
+        return False
+    return bool(_BOLD_WRAP_RX.match(text)) and not _BOLD_RX.search(text[3:-3])
+
+class ItemFeatures():
 
+    __slots__ = ("text", "italic", "bold_count", "_sentence")
+
+    def __init__(self, text):
+        """
+        Features of an item's text used by the heuristic classifiers, found once per
+        item by item_features()
+
+        italic = True if the whole text is wrapped in '' italic markup, same as is_italic()
+        bold_count = number of ''' in the text
+        sentence = True if the text starts with a capital and ends with punctuation, same
+                   as is_sentence(), found the first time it's used
+        """
+        self.text = text
+        self.italic = is_italic(text)
+        self.bold_count = text.count("'''")
+        self._sentence = None
+
+    @property
+    def sentence(self):
+        if self._sentence is None:
+            self._sentence = is_sentence(self.text)
+        return self._sentence
+
+def item_features(item):
+    """ Returns the ItemFeatures of an item's data, computed once until the data changes """
+    features = item._features
+    if features is None or features.text is not item.data:
+        features = ItemFeatures(item.data)
+        item._features = features
+    return features
+
+_bare_uxi_pattern = r"{{lang[|][^{}]*}} — [A-Za-z\"',;.?! ]+$"
+_BARE_UXI_RX = re.compile(_bare_uxi_pattern)
 def is_bare_uxi(item):
-    return not item._children and re.match(r"{{lang[|][^{}]*}} — [A-Za-z\"',;.?! ]+$", item.data)
+    return not item._children and item.data.startswith("{{lang|") and bool(_BARE_UXI_RX.match(item.data))
 
 def is_bare_ux(item):
 
-    passage = str(item.data)
-    #print("is_bare_ux?", passage)
-
-    # Must be an italic string
-    if not is_italic(passage):
-        #print("not italic")
+    # Must be an italic string, almost every item fails before its features are needed
+    if not item.data.startswith("''"):
+        return False
+    features = item_features(item)
+    if not features.italic:
         return False
 
     # Must contain at least 1 bold item
-    if not passage.count("'''") > 1:
-        #print("no bold")
+    if features.bold_count < 2:
         return False
 
     # Should not contain links
@@ -357,40 +677,31 @@ def is_bare_ux(item):
     # TODO: English passages must be sentences
 
     if not item._children:
-        #print("no children")
         return True
 
     # If it contains a child, should only have 1 child
     if len(item._children) > 1:
-        #print("too many children")
         return False
 
     # TODO: English items should not have a translation
 
-    #print("scanning child", item._children[0])
     return is_translation(item._children[0])
 
 
 def is_translation(item):
 
-    translation = str(item.data)
-
-    # Must start with a capital and end with punctuation
-    if not is_sentence(translation):
-        #print("not a sentence")
+    # Translation should not have a child (TODO: Not necessarily true, may contain transliteration)
+    if item._children:
         return False
 
-    # Must contain at least 1 bold item
-    if not translation.count("'''") > 1:
-        #print("no bold")
-        return False
+    features = item_features(item)
 
-    # Translation should not have a child (TODO: Not necessarily true, may contain transliteration)
-    if item._children:
-        #print("has children")
+    # Must contain at least 1 bold item
+    if features.bold_count < 2:
         return False
 
-    return True
+    # Must start with a capital and end with punctuation
+    return features.sentence
 
 
 
@@ -430,13 +741,135 @@ _quote_line_pattern = fr"""(?x)
     $
 """
 
-BARE_QUOTE_START_RX = re.compile(_quote_start_pattern)
-BARE_QUOTE_LINE_RX = re.compile(_quote_line_pattern, re.MULTILINE)
+# The quote patterns are slow to compile, so they're compiled on first use
+@functools.lru_cache(maxsize=None)
+def _compile_bare_quote_rx(name):
+    if name == "BARE_QUOTE_START_RX":
+        return re.compile(_quote_start_pattern)
+    if name == "BARE_QUOTE_LINE_RX":
+        return re.compile(_quote_line_pattern, re.MULTILINE)
+
+def __getattr__(name):
+    if name in ("BARE_QUOTE_START_RX", "BARE_QUOTE_LINE_RX"):
+        return _compile_bare_quote_rx(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def is_bare_quote(item):
-    return bool(re.match(BARE_QUOTE_START_RX, item.data))
+    return bool(_compile_bare_quote_rx("BARE_QUOTE_START_RX").match(item.data))
+
+def _scope_flags(pattern):
+    # Leading global flags like (?x) are only allowed at the start of a pattern,
+    # convert them to a scoped group so the pattern can be combined with others
+    m = re.match(r"\(\?([imsx]+)\)", pattern)
+    if m:
+        return f"(?{m.group(1)}:{pattern[m.end():]})"
+    return f"(?:{pattern})"
+
+class ItemClassifiers():
+
+    def __init__(self, default="unknown"):
+        """
+        Registry of the classifiers used by PosParser.get_item_type()
+
+        Template classifiers assign a type to items containing a given template,
+        heuristic classifiers assign a type to items without any typed templates
+
+        default = type of items that don't match any heuristic
+        """
+        self.default = default
+        self._templates = []
+        self._heuristics = []
+        self._compiled = None
+
+    def add_templates(self, item_type, names, priority=0, check=None):
+        """
+        Classifies items containing any of the named templates as item_type
+
+        priority = classifiers for the same template are tried from the highest priority down
+        check = optional function called with the template, the classifier only applies if it returns True
+        """
+        self._templates.append((priority, item_type, tuple(names), check))
+        self._compiled = None
+
+    def add_heuristic(self, item_type, pattern=None, check=None, priority=0):
+        """
+        Classifies items without any typed templates as item_type
+
+        pattern = regex that must match at the start of the item data
+        check = optional function called with the ListItem, the classifier only applies if it returns True
+        priority = heuristics are tried from the highest priority down, the first match wins
+        """
+        if pattern is None and check is None:
+            raise ValueError("heuristic needs a pattern or a check", item_type)
+        self._heuristics.append((priority, item_type, pattern, check))
+        self._compiled = None
+
+    def compile(self):
+        """
+        Returns (token, template table, heuristics, combined regex), compiled on first use
+        The token is a new object every time the classifiers change
+        """
+        if self._compiled:
+            return self._compiled
+
+        # sorted() is stable, classifiers with the same priority keep their registration order
+        table = {}
+        for _, item_type, names, check in sorted(self._templates, key=lambda x: -x[0]):
+            for name in names:
+                table.setdefault(name, []).append((item_type, check))
+
+        # Every pattern is an optional lookahead group, so a single match() at the
+        # start of the item finds all of the patterns that match
+        heuristics = []
+        groups = []
+        for idx, (_, item_type, pattern, check) in enumerate(sorted(self._heuristics, key=lambda x: -x[0])):
+            group = None
+            if pattern is not None:
+                group = f"h{idx}"
+                groups.append(f"(?:(?=(?P<{group}>{_scope_flags(pattern)})))?")
+            heuristics.append((item_type, group, check))
+
+        self._compiled = (object(), table, heuristics, re.compile("".join(groups)))
+        return self._compiled
+
+    def template_type(self, template):
+        """ Returns the item type for a template, or None """
+        for item_type, check in self.compile()[1].get(template.name.strip(), ()):
+            if check is None or check(template):
+                return item_type
+
+    def heuristic_type(self, item):
+        """ Returns the item type of an item without any typed templates """
+        _, _, heuristics, rx = self.compile()
+        m = rx.match(item.data)
+        for item_type, group, check in heuristics:
+            if group and m.group(group) is None:
+                continue
+            if check is None or check(item):
+                return item_type
+        return self.default
+
+# Used by every PosParser unless other classifiers are given
+CLASSIFIERS = ItemClassifiers()
+for _item_type, _names in PosParser.TYPE_TO_TEMPLATES.items():
+    CLASSIFIERS.add_templates(_item_type, _names)
+# "zh-x" may be a quote or a ux, depending on the existence of a "ref=" parameter
+CLASSIFIERS.add_templates("quote", ["zh-x"], priority=10, check=lambda t: t.has("ref"))
+
+# RQ: templates are quotes
+CLASSIFIERS.add_heuristic("quote", r"\s*{{\s*(R|RQ):", priority=40)
+CLASSIFIERS.add_heuristic("bare_quote", _quote_start_pattern, priority=30)
+CLASSIFIERS.add_heuristic("bare_uxi", _bare_uxi_pattern, check=lambda item: not item._children, priority=20)
+CLASSIFIERS.add_heuristic("bare_ux", check=is_bare_ux, priority=10)
 
 class ListItem():
+
+    # Index of the item's line in the section's content_wikilines, see PosParser.span()
+    _line = None
+
+    # ItemFeatures of the item's data, see item_features()
+    _features = None
+
     def __init__(self, parent, prefix, data, name):
         self.parent = parent
         self.level = len(prefix)
@@ -473,3 +906,27 @@ class ListItem():
         return self.prefix + " " + self.data
 
 
+class LazyListItem(ListItem):
+
+    def __init__(self, pos, parent, prefix, data, name):
+        """
+        ListItem created by a lazy PosParser, _type is set for the item and its
+        siblings the first time it's used and the _children of top level senses
+        are created the first time they're used
+
+        pos = PosParser that created the item
+        """
+        super().__init__(parent, prefix, data, name)
+        self._pos = pos
+        del self._type
+
+    def __getattr__(self, name):
+        if name == "_children" and "_pending" in self.__dict__:
+            self._pos._build_children(self)
+            return self._children
+        if name == "_type" and "_pos" in self.__dict__:
+            self._pos._set_sibling_types(self)
+            return self._type
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+
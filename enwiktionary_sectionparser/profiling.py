@@ -0,0 +1,81 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Per-phase timing of the parsers
+
+    profile = Profile()
+    for text, title in pages:
+        entry = parse(text, title, profile=profile)
+        ...
+    print(profile.report())
+
+Phases are named after the step of the parser they time, sub-phases are
+prefixed with the name of the phase that contains them (add.categories is
+part of add) so the totals of sub-phases are included in their parent.
+"""
+
+import collections
+import contextlib
+import time
+
+perf_counter = time.perf_counter
+
+def timed(profile, phase, func, *args):
+    """ Returns func(*args), adding the time spent to phase """
+    start = perf_counter()
+    res = func(*args)
+    profile.add(phase, perf_counter() - start)
+    return res
+
+
+class Profile():
+
+    def __init__(self):
+        self.times = collections.defaultdict(float)
+        self.calls = collections.defaultdict(int)
+
+    def add(self, phase, elapsed, calls=1):
+        self.times[phase] += elapsed
+        self.calls[phase] += calls
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Context manager that adds the time spent inside it to the given phase """
+        start = perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(name, perf_counter() - start)
+
+    def merge(self, other):
+        """ Adds the timings from another Profile, eg from a worker process """
+        for phase, elapsed in other.times.items():
+            self.add(phase, elapsed, other.calls[phase])
+
+    def clear(self):
+        self.times.clear()
+        self.calls.clear()
+
+    def stats(self):
+        """ Returns a list of (phase, total seconds, calls, mean seconds) sorted by phase """
+        return [(phase, self.times[phase], self.calls[phase], self.times[phase]/self.calls[phase] if self.calls[phase] else 0)
+                for phase in sorted(self.times)]
+
+    def report(self):
+        lines = [f"{'phase':32} {'total':>10} {'calls':>10} {'mean':>10}"]
+        for phase, total, calls, mean in self.stats():
+            lines.append(f"{phase:32} {total:9.3f}s {calls:10} {mean*1000000:8.1f}us")
+        return "\n".join(lines)
@@ -0,0 +1,200 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Section queries across many pages
+
+    query = compile_path("Spanish/Etymology */Noun/Usage notes")
+    for title, path, text in run_query(query, pages):
+        ...
+
+A path expression is a list of section names separated by /, or a tuple of
+names. Each name is matched with fnmatch rules (* ? [abc]) against the section
+title including its count, a name without a count also matches numbered
+sections (Etymology matches Etymology 1 and Etymology 2, Etymology 1 only
+matches Etymology 1). A ** component matches any number of sections.
+
+Pages are checked with scan_headings() first and only the L2 sections that
+contain a match are parsed.
+"""
+
+import collections
+import fnmatch
+import functools
+import itertools
+import re
+
+from .sectionparser import SectionParser, scan_headings
+
+RE_NAME_COUNT = re.compile(r"(.*) \d+(?:[.]\d+)?$")
+
+class PathQuery():
+
+    def __init__(self, expr):
+        """
+        expr = path expression, eg. "Spanish/Etymology */Noun" or "*/Verb" or "**/Usage notes"
+               or a tuple of names eg. ("English", "**", "Noun")
+        """
+        self.expr = expr
+        if isinstance(expr, str):
+            components = [c.strip() for c in expr.strip("/").split("/")]
+        else:
+            components = list(expr)
+        if not components or not all(components):
+            raise ValueError("empty component in path expression", expr)
+
+        # ** is kept as a string, everything else is compiled
+        self._patterns = tuple(c if c == "**" else re.compile(fnmatch.translate(c)) for c in components)
+
+    def __repr__(self):
+        return f"PathQuery({self.expr!r})"
+
+    def _match_name(self, pattern, name):
+        if pattern.match(name):
+            return True
+
+        # Names without a count match numbered sections
+        m = RE_NAME_COUNT.match(name)
+        return bool(m and pattern.match(m.group(1)))
+
+    def match(self, names):
+        """ Returns True if the list of section names (from the L2 down) matches the expression """
+        return self._match(names, 0, 0)
+
+    def _match(self, names, idx, pat_idx):
+        patterns = self._patterns
+        while pat_idx < len(patterns):
+            pattern = patterns[pat_idx]
+            if pattern == "**":
+                return any(self._match(names, i, pat_idx+1) for i in range(idx, len(names)+1))
+            if idx >= len(names) or not self._match_name(pattern, names[idx]):
+                return False
+            idx += 1
+            pat_idx += 1
+        return idx == len(names)
+
+    def match_prefix(self, names):
+        """ Returns True if the expression could match the list of names or any of its subsections """
+        patterns = self._patterns
+        for idx, name in enumerate(names):
+            if idx >= len(patterns):
+                return False
+            if patterns[idx] == "**":
+                return True
+            if not self._match_name(patterns[idx], name):
+                return False
+        return True
+
+    def _blocks(self, text):
+        # Returns a list of (start, end) of the top level sections that may contain matches
+        headings = scan_headings(text)
+
+        blocks = []
+        stack = []
+        block_start = None
+        keep = False
+        for offset, level, title, count in headings:
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+
+            name = title + " " + count if count else title
+            if not stack:
+                if keep:
+                    blocks.append((block_start, offset))
+                block_start = offset
+                keep = False
+                viable = self.match_prefix([name])
+
+            stack.append((level, name))
+            if viable and not keep:
+                keep = self.match([name for _, name in stack])
+
+        if keep:
+            blocks.append((block_start, len(text)))
+
+        return blocks
+
+    def query_page(self, text, title):
+        """ Returns a list of (title, path, section text) for every matching section in the page """
+        results = []
+        for start, end in self._blocks(text):
+            entry = SectionParser(text[start:end], title)
+
+            # Skip blocks with unclosed templates or comments, same as parse()
+            if entry._state:
+                continue
+
+            for section in entry.ifilter_sections():
+                names = list(section.lineage)[-2::-1]
+                if self.match(names):
+                    results.append((title, section.path, str(section)))
+
+        return results
+
+
+def compile_path(expr):
+    """ Returns a PathQuery for the path expression or sequence of names, see PathQuery """
+    if isinstance(expr, PathQuery):
+        return expr
+    # Lists can't be used as a cache key
+    if isinstance(expr, list):
+        expr = tuple(expr)
+    return _compile_path(expr)
+
+@functools.lru_cache(maxsize=256)
+def _compile_path(expr):
+    return PathQuery(expr)
+
+
+def _query_chunk(query, pages):
+    results = []
+    for text, title in pages:
+        results += query.query_page(text, title)
+    return results
+
+def run_query(query, pages, executor=None, chunksize=64, prefetch=8):
+    """
+    Lazily yields (title, path, section text) for every section matching query in pages
+
+    query = path expression or PathQuery
+    pages = iterable of (text, title)
+    executor = optional concurrent.futures executor, pages are sent to it in
+               chunks of chunksize pages, at most prefetch chunks at once
+    """
+    query = compile_path(query)
+
+    if executor is None:
+        for text, title in pages:
+            yield from query.query_page(text, title)
+        return
+
+    pages = iter(pages)
+    pending = collections.deque()
+    try:
+        while True:
+            while len(pending) < prefetch:
+                chunk = list(itertools.islice(pages, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_query_chunk, query, chunk))
+
+            if not pending:
+                break
+
+            yield from pending.popleft().result()
+
+    finally:
+        for future in pending:
+            future.cancel()
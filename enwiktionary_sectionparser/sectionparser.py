@@ -13,44 +13,284 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
+import hashlib
 import re
-from .utils import wiki_splitlines
+from .utils import wiki_line_starts, wiki_splitlines
+from .profiling import perf_counter, timed
+from .logsink import make_sink
+
+# Compiled once and shared by all parsers
+RE_HEADING = re.compile(r"(==+)([^=]+)(==+)\s*(.*?)\s*$")
+RE_HEADING_COUNT = re.compile(r"\s*([^\d]*?)\s*(\d+[.]\d+|\d*)\s*$")
+RE_HEADING_COMMENT = re.compile(r"^\<!--.*--\>$")
+RE_HTML_COMMENTS = re.compile("(<!--.*?-->)")
+RE_EMPTY_LINE = re.compile(r"^(----+)?\s*$")
+
+
+def _clone(section, parent):
+    # Returns a shallow copy of section that shares all line lists and children
+    # with the original, the lists are copied by the first side that modifies them
+    clone = copy.copy(section)
+    clone.parent = parent
+    clone._cow_children = True
+    clone._cow_lines = True
+    if section._topmost is section:
+        clone._topmost = clone
+    elif parent is not None:
+        clone._topmost = parent._topmost
+    return clone
+
+def _own_children(node):
+    # Takes ownership of a children list shared with a forked tree
+    # Children that belong to node are kept and replaced in the shared list with
+    # snapshots, children that belong to another tree are replaced with clones
+    if not node._cow_children:
+        return
+
+    shared = node._children
+    children = []
+    for idx, child in enumerate(shared):
+        if child.parent is node:
+            shared[idx] = _clone(child, None)
+            child._cow_children = True
+            child._cow_lines = True
+            children.append(child)
+        else:
+            children.append(_clone(child, node))
+
+    node._children = children
+    node._cow_children = False
+
+def _adopt_children(node):
+    # Read only walks can leave a shared children list alone as long as all of the
+    # children belong to node, _make_private() takes ownership before any modification
+    if node._cow_children and any(child.parent is not node for child in node._children):
+        _own_children(node)
+
+
+def _heading_parts(m):
+    # Returns (level, title, count) from a RE_HEADING match
+    level = min(len(m.group(1)), len(m.group(3)))
+    lpad = (len(m.group(1))-level) * "="
+    rpad = (len(m.group(3))-level) * "="
+
+    # Count may be in the format N or N.N (Etymology 2.3)
+    count_m = RE_HEADING_COUNT.match(m.group(2))
+    if count_m:
+        return level, lpad + count_m.group(1) + rpad, count_m.group(2)
+    return level, m.group(2), None
+
+def scan_headings(text):
+    """
+    Returns a list of (offset, level, title, count) for every section heading in text,
+    without building a SectionParser
+
+    Headings are detected with the same rules as SectionParser, headings inside
+    comments, templates, nowiki and other wiki elements are ignored.
+    offset is the index in text of the first character of the heading line
+    """
+    headings = []
+
+    for start in wiki_line_starts(text, "=="):
+        end = text.find("\n", start)
+        line = text[start:end] if end >= 0 else text[start:]
+
+        # The heading line continues past the newline if it opens a wiki element
+        if "{" in line or "<" in line or "[[" in line:
+            line = next(wiki_splitlines(text[start:]))
+
+        m = RE_HEADING.match(line)
+        if m:
+            headings.append((start,) + _heading_parts(m))
+
+    return headings
+
+def heading_paths(headings):
+    """
+    Yields (offset, path) for every heading returned by scan_headings(), path is
+    formatted like Section.path eg. English:Etymology 1:Noun
+    """
+    stack = []
+    for offset, level, title, count in headings:
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, title + " " + count if count else title))
+        yield offset, ":".join(name for _, name in stack)
+
+
+def _end_section(section, next_level, changes):
+    # Adds the changes for a section that is followed by a heading at next_level
+    if next_level == 2 and any("----" in line for line in section._trailing_empty_lines):
+        changes.append("removed ---- L2 separator")
+
+    # Empty sections should have a single leading empty line
+    elif not section._content_wikilines and not section._children and section._leading_empty_lines != [""]:
+        changes.append("one empty line between sections per [[WT:NORM]]")
+
+    # All other sections should end with a single blank line
+    elif (section._content_wikilines or section._children) and section._trailing_empty_lines != [""]:
+        changes.append("one empty line between sections per [[WT:NORM]]")
+
+    changes += section._changes
+
+def _subtree_changes(section, next_level):
+    # Returns the changes that parsing section and its subsections added to the page
+    # changes, next_level = level of the heading that follows them, if any
+    sections = [section] + list(section.ifilter_sections())
+    text = section._page_text()
+    changes = []
+    for current, following in zip(sections, sections[1:] + [None]):
+        heading_span = current.heading_span
+        if current is not section and heading_span and current.header.strip() != text[slice(*heading_span)]:
+            changes.append("no leading or trailing spaces on section headers per [[WT:NORM]]")
+
+        level = following.level if following else next_level
+        if level:
+            _end_section(current, level, changes)
+        else:
+            changes += current._changes
+    return changes
+
+def _next_level(section):
+    # Returns the level of the heading after section and its subsections, or None at the end of the page
+    node = section
+    while isinstance(node, Section):
+        siblings = node.parent._children
+        idx = next(i for i, sibling in enumerate(siblings) if sibling is node)
+        if idx+1 < len(siblings):
+            return siblings[idx+1].level
+        node = node.parent
+
+def _owned_sections(node):
+    # Yields all subsections of node, taking ownership of children lists shared with a forked tree
+    _own_children(node)
+    for child in node._children:
+        yield child
+        yield from _owned_sections(child)
+
+def _reparse_lines(section):
+    # Returns a detached section with the lines before the first subsection of section parsed
+    # again from the page text, or None if the section was modified
+    text = section._page_text()
+    if section._span is None or text is None:
+        return
+
+    offset = section._topmost._offset
+    start, _, end = section._span
+    wikilines = list(wiki_splitlines(text[offset+start:offset+end]))
+
+    replay = Section(section.parent, section.level, section.title, section.count)
+    header_text = RE_HEADING.match(wikilines[0]).group(4)
+    if header_text:
+        replay._add(header_text)
+    for wikiline in wikilines[1:]:
+        replay._add(wikiline)
+    return replay
+
+def _end_span(section, end):
+    # Sets the end of the lines of a section to the given position in the page text
+    if section._span:
+        section._span = section._span[:2] + (end - section._topmost._offset,)
+
+def _block_keys(text):
+    # Returns a list of (start, end, key) for each top level section in text, key
+    # changes if the text of the section or the level of the next section changes
+    roots = []
+    level = None
+    for offset, heading_level, _, _ in scan_headings(text):
+        if level is None or heading_level <= level:
+            roots.append((offset, heading_level))
+            level = heading_level
+
+    res = []
+    for idx, (start, level) in enumerate(roots):
+        if idx+1 < len(roots):
+            end, next_level = roots[idx+1]
+        else:
+            end, next_level = len(text), None
+        res.append((start, end, (hashlib.sha1(text[start:end].encode("utf-8")).digest(), next_level)))
+    return res
+
+def _ifilter_path(node, query, recursive, prefix=()):
+    # Yields the descendants of node matching a path pattern, skipping any
+    # subtree that can't contain a match
+    if not prefix:
+        from .query import compile_path
+        query = compile_path(query)
+
+    _adopt_children(node)
+    for child in node._children:
+        names = prefix + (child.title + " " + child.count if child.count else child.title,)
+        if not query.match_prefix(names):
+            continue
+        if query.match(names):
+            yield child
+        if recursive:
+            yield from _ifilter_path(child, query, recursive, names)
+
 
 class SectionParser():
 
-    def __init__(self, text, page_title, log=None):
+    # Set when the children or line lists may be shared with a fork, see fork()
+    _cow_children = False
+    _cow_lines = False
+
+    def __init__(self, text, page_title, log=None, profile=None, previous=None):
         """
         text = page text
         title = page title
-        log = list to append log messages
+        log = list to append log messages or a sink, see logsink
+        profile = optional profiling.Profile to collect timings
+        previous = SectionParser for an older revision of the page, top level
+                   sections with identical text are reused instead of parsed,
+                   unless log is set
         """
         self.title = page_title
         self.level = 1
         self._state = 0
-        self._log = log
+        self._log = make_sink(log)
+        self._profile = profile
+
+        if profile:
+            start = perf_counter()
 
         self._changes = []
         clean_text = text.replace('\u2029', "")
         if clean_text != text:
             self._changes.append("removed unicode paragraph separator")
 
-        self.content_wikilines, self._children, changes = self.parse(clean_text)
+        self._text = clean_text
+        self._span = (0, len(clean_text))
+        self._content_wikilines, self._children, changes = self.parse(clean_text, previous)
         self._changes += changes
 
+        if profile:
+            profile.add("parse", perf_counter() - start)
+
+
+    # The parser state holds re.Match objects, which can't be pickled, and the
+    # log belongs to the caller, neither should be sent to another process
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_state"] = {k: True for k in self._state} if self._state else self._state
+        state["_log"] = None
+        state["_profile"] = None
+        return state
 
     def log(self, error, section, line):
         if self._log is None:
             return
-        lineage = list(section.lineage) if section else [ self.title, "" ]
-        page = lineage.pop
-        path = ":".join(reversed(lineage))
-        self._log.append((error, path, line))
-        return
+        self._log(error, section if section else self, line)
 
     @property
     def page(self):
         return self.title
 
+    @property
+    def lineage(self):
+        yield self.title
+
     @property
     def changelog(self):
         summary = []
@@ -61,12 +301,66 @@ class SectionParser():
                 seen.add(item)
         return "; ".join(summary)
 
+    @property
+    def span(self):
+        """ (0, length of the page text), or None if the page was modified """
+        if self._span and self._text is not None:
+            return self._span
+
+    @property
+    def raw_text(self):
+        """ The page text, or None if the page was modified """
+        if self.span:
+            return self._text
+
+    def fork(self):
+        """
+        Returns a copy-on-write clone of the page
+
+        The clone shares all sections and lines with the original, sections are only
+        copied when they are visited or modified through the public methods
+        """
+        clone = copy.copy(self)
+        for node in (self, clone):
+            node._cow_children = True
+            node._cow_lines = True
+        return clone
+
+    @property
+    def content_wikilines(self):
+        """ The lines before the first section, the list can be modified in place """
+        # The list may be modified, so it's treated like a modification, see span
+        self._make_private()
+        return self._content_wikilines
+
+    @content_wikilines.setter
+    def content_wikilines(self, lines):
+        self._make_private()
+        self._content_wikilines = lines
+
+    def _own_lines(self):
+        if not self._cow_lines:
+            return
+        self._content_wikilines = list(self._content_wikilines)
+        self._changes = list(self._changes)
+        self._cow_lines = False
+
+    def _make_private(self):
+        _own_children(self)
+        self._own_lines()
+        self._span = None
+
     def ifilter_sections(self, recursive=True, matches=lambda x: True):
 
+        if not callable(matches) and not isinstance(matches, str):
+            yield from _ifilter_path(self, matches, recursive)
+            return
+
         if not callable(matches):
             match_title = matches
             matches = lambda x: x.title == match_title
 
+        _adopt_children(self)
         for child in self._children:
             if matches(child):
                 yield child
@@ -78,44 +372,133 @@ class SectionParser():
 
     @property
     def header(self):
-        if self.content_wikilines:
-            return "\n".join(self.content_wikilines) + "\n"
+        if self._content_wikilines:
+            return "\n".join(self._content_wikilines) + "\n"
         return ""
 
     def __str__(self):
-        return self.header + "\n".join(list(map(str, self._children))).rstrip()
+        if self._profile:
+            start = perf_counter()
 
-    def parse(self, text):
+        res = self.header + "\n".join(list(map(str, self._children))).rstrip()
 
-        header = []
-        children = []
-        changes = []
+        if self._profile:
+            self._profile.add("serialize", perf_counter() - start)
+        return res
+
+    def parse(self, text, previous=None):
+
+        # Reused sections would be missing their log messages
+        if previous is not None and self._log is None:
+            res = self._parse_reusing(text, previous)
+            if res:
+                return res
+
+        profile = self._profile
 
-        prev_section = None
+        if profile:
+            start = perf_counter()
 
         wikilines = list(wiki_splitlines(text, return_state=True))
         self._state = wikilines.pop()
 
-        wikiline = None
+        if profile:
+            profile.add("splitlines", perf_counter() - start)
+
+        blocks = []
+        header, children, changes = self._parse_wikilines(wikilines, offset=0, blocks=blocks)
+
+        # The changes for each top level section are kept so that they can be reused
+        ends = [start for _, start in blocks[1:]] + [len(changes)]
+        self._blocks = [(section, changes[start:end]) for (section, start), end in zip(blocks, ends)]
+
+        return header, children, changes
+
+    def _parse_reusing(self, text, previous):
+        # Parses text, reusing the top level sections of previous that have the same text
+        # Returns None if nothing can be reused or if the page has an unclosed template
+        # or comment, in which case the whole page must be parsed
+
+        old_blocks = getattr(previous, "_blocks", None)
+        if not old_blocks or not previous._text or previous._state:
+            return
+
+        old_keys = _block_keys(previous._text)
+        if len(old_keys) != len(old_blocks):
+            return
+
+        # Sections that were modified have no span
+        reusable = {key: block for (_, _, key), block in zip(old_keys, old_blocks) if block[0]._span is not None}
+        new_keys = _block_keys(text)
+        if not any(key in reusable for _, _, key in new_keys):
+            return
+
+        # Split everything before parsing, so nothing is logged if the page can't be reused
+        header_end = new_keys[0][0]
+        splits = []
+        for start, end, key in [(0, header_end, None)] + new_keys:
+            if key in reusable:
+                splits.append(None)
+                continue
+            wikilines = list(wiki_splitlines(text[start:end], return_state=True))
+            if wikilines.pop():
+                return
+            splits.append(wikilines)
+
+        header, _, changes = self._parse_wikilines(splits[0], offset=0)
+        children = []
+        self._blocks = []
+        for (start, end, key), wikilines in zip(new_keys, splits[1:]):
+            if wikilines is None:
+                old_section, section_changes = reusable[key]
+                old_section._cow_children = True
+                old_section._cow_lines = True
+                section = _clone(old_section, self)
+                section._offset = start
+            else:
+                _, (section,), section_changes = self._parse_wikilines(wikilines, offset=start, next_level=key[1])
+
+            children.append(section)
+            changes += section_changes
+            self._blocks.append((section, section_changes))
+
+        self._state = {}
+        return header, children, changes
+
+    def _parse_wikilines(self, wikilines, prev_section=None, offset=None, next_level=None, blocks=None):
+        # Returns (header lines, top level sections, changes)
+        # When prev_section is set, lines before the first heading are added to it
+        # offset = position of the first line in the page text, new sections have no span if None
+        # next_level = level of the heading that follows wikilines, if any
+        # blocks = list to append (top level section, index of its first change)
+
+        header = []
+        children = []
+        changes = []
+
+        profile = self._profile
+        pos = offset
+
         for wikiline in wikilines:
 
+            if pos is not None:
+                line_start = pos
+                pos += len(wikiline) + 1
+
+            if profile:
+                start = perf_counter()
+
             # New section start
-            m = re.match(r"(==+)([^=]+)(==+)\s*(.*?)\s*$", wikiline)
-            if m:
-                level = min(len(m.group(1)), len(m.group(3)))
-                lpad = (len(m.group(1))-level) * "="
-                rpad = (len(m.group(3))-level) * "="
-                header_text = m.group(4)
+            m = RE_HEADING.match(wikiline)
 
+            if profile:
+                profile.add("heading_match", perf_counter() - start)
 
-                # Count may be in the format N or N.N (Etymology 2.3)
-                count_m = re.match(r"\s*([^\d]*?)\s*(\d+[.]\d+|\d*)\s*$", m.group(2))
-                if count_m:
-                    title = lpad + count_m.group(1) + rpad
-                    count = count_m.group(2)
-                else:
-                    title = m.group(2)
-                    count = None
+            if m:
+                if profile:
+                    start = perf_counter()
+                level, title, count = _heading_parts(m)
+                header_text = m.group(4)
 
                 if not prev_section:
                     parent = self
@@ -129,35 +512,37 @@ class SectionParser():
                         parent = parent.parent
 
                 new_section = Section(parent, level, title, count)
+                if pos is not None:
+                    if prev_section:
+                        _end_span(prev_section, line_start - 1)
+                    if parent == self:
+                        new_section._offset = line_start
+                    base = new_section._topmost._offset
+                    new_section._span = (line_start - base, line_start + len(wikiline) - base, None)
+
                 if header_text:
-                    if re.match(r"^\<!--.*--\>$", header_text):
+                    if RE_HEADING_COMMENT.match(header_text):
                         self.log("comment_on_title", new_section, wikiline)
                     else:
                         self.log("text_on_title", new_section, wikiline)
-                    new_section.add(header_text)
+                    new_section._add(header_text)
 
                 if prev_section:
-                    if level == 2 and any("----" in line for line in prev_section._trailing_empty_lines):
-                        changes.append("removed ---- L2 separator")
-
-                    # Empty sections should have a single leading empty line
-                    elif not prev_section.content_wikilines and not prev_section._children and prev_section._leading_empty_lines != [""]:
-                        changes.append("one empty line between sections per [[WT:NORM]]")
-
-                    # All other sections should end with a single blank line
-                    elif (prev_section.content_wikilines or prev_section._children) and prev_section._trailing_empty_lines != [""]:
-                        changes.append("one empty line between sections per [[WT:NORM]]")
-
-                    changes += prev_section._changes
+                    _end_section(prev_section, level, changes)
 
                 if parent == self:
                     children.append(new_section)
+                    if blocks is not None:
+                        blocks.append((new_section, len(changes)))
                 else:
-                    parent.add(new_section)
+                    parent._add(new_section)
 
                 if new_section.header.strip() != wikiline:
                     changes.append("no leading or trailing spaces on section headers per [[WT:NORM]]")
 
+                if profile:
+                    profile.add("heading", perf_counter() - start)
+
                 prev_section = new_section
                 continue
 
@@ -172,35 +557,59 @@ class SectionParser():
 
             if not prev_section:
                 header.append(wikiline)
+            elif profile:
+                start = perf_counter()
+                prev_section._add(wikiline, profile=profile)
+                profile.add("add", perf_counter() - start)
             else:
-                prev_section.add(wikiline)
+                prev_section._add(wikiline)
 
         if prev_section:
-            changes += prev_section._changes
+            if pos is not None:
+                _end_span(prev_section, pos - 1)
+
+            if next_level:
+                _end_section(prev_section, next_level, changes)
+            else:
+                changes += prev_section._changes
 
         return header, children, changes
 
 
 class Section():
 
+    # Set when the children or line lists may be shared with a fork, see SectionParser.fork()
+    _cow_children = False
+    _cow_lines = False
+
+    # (heading start, heading end, end of the lines before the first subsection)
+    # relative to _offset, the start of the topmost section in the page text, see span
+    _span = None
+    _offset = 0
+
+    # The category lines found in this section, see replace_text()
+    _category_lines = ()
+
     # Category templates should always be at the very end of the last section
     cat_templates = [ "c", "C", "cat", "top", "topic", "topics", "categorize", "catlangname", "catlangcode", "cln", "zh-cat",
             "eo F", "eo [1-9]OA", "eo-categoryTOC", "eo BRO", "eo GCSE", "Universala Vortaro", "yur-rhotacized" ]
     re_cat_templates = r"\{\{\s*(" + "|".join(cat_templates) + r")\s*[|}][^{}]*\}*"
     re_categories = r"\[\[\s*[cC]at(egory)?\s*:[^\]]*\]\]"
     re_match_categories = fr"({re_cat_templates}|{re_categories})"
+    rx_match_categories = re.compile(re_match_categories)
 
     # Templates that should always appear at the top of an entry immediately after the L2 header
     topline_templates = [ "LDL", "normalized", "hot word", "rfd" ]
     re_match_toplines = r"(\{\{\s*(" + "|".join(topline_templates) + r")\s*[|}][^}]*\}*)"
+    rx_match_toplines = re.compile(re_match_toplines)
 
     def __init__(self, parent, level, title, count=None):
         self.parent = parent
-        self.level = level
-        self.title = title
-        self.count = count
+        self._level = level
+        self._title = title
+        self._count = count
 
-        self.content_wikilines = []
+        self._content_wikilines = []
         self._leading_empty_lines = []
         self._trailing_empty_lines = []
         self._children = []
@@ -216,7 +625,77 @@ class Section():
             self._toplines = []
         self._topmost = target
 
+    def _own_lines(self):
+        if not self._cow_lines:
+            return
+        self._content_wikilines = list(self._content_wikilines)
+        self._leading_empty_lines = list(self._leading_empty_lines)
+        self._trailing_empty_lines = list(self._trailing_empty_lines)
+        self._changes = list(self._changes)
+        if self._category_lines:
+            self._category_lines = list(self._category_lines)
+        if self._topmost is self:
+            self._categories = list(self._categories)
+            self._toplines = list(self._toplines)
+        self._cow_lines = False
+
+    @property
+    def content_wikilines(self):
+        """ The lines before the first subsection, the list can be modified in place """
+        # The list may be modified, so it can't be shared with a forked tree and the
+        # section no longer matches the page text, see span
+        self._make_private()
+        return self._content_wikilines
+
+    @content_wikilines.setter
+    def content_wikilines(self, lines):
+        self._make_private()
+        self._content_wikilines = lines
+
+    # The heading attributes are properties so that changing them is handled like
+    # any other modification, see _make_private()
+    @property
+    def title(self):
+        return self._title
+
+    @title.setter
+    def title(self, title):
+        self._make_private()
+        self._title = title
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        self._make_private()
+        self._level = level
+
+    @property
+    def count(self):
+        return self._count
+
+    @count.setter
+    def count(self, count):
+        self._make_private()
+        self._count = count
+
+    def _make_private(self):
+        # Called before any modification, ensures that this section and the path to
+        # it are not shared with a forked tree
+        for node in reversed(list(self.ancestors)):
+            _own_children(node)
+        self._own_lines()
+        self._topmost._own_lines()
+
+        # The page text no longer matches this section and its parents, see span
+        for node in self.ancestors:
+            node._span = None
+
     def adjust_level(self, new_level):
+        self._make_private()
+
         # Strip any unbalanced = in the title
         # when explicitly setting the level
         self.title = self.title.strip("= ")
@@ -226,6 +705,9 @@ class Section():
                 child.adjust_level(new_level + 1)
 
     def reparent(self, new_parent, index=None):
+        self._make_private()
+        new_parent._make_private()
+
         self.parent._children.remove(self)
         if index is None:
             new_parent._children.append(self)
@@ -238,16 +720,16 @@ class Section():
     @classmethod
     def has_category(cls, line):
         # Returns True if there is a category classifier anywhere on the line
-        return bool(re.search(cls.re_match_categories, line))
+        return bool(cls.rx_match_categories.search(line))
 
     @classmethod
     def is_topline(cls, line):
         # Returns True if a line contains a template that should be at the top of the language entry
 
         # Remove HTML comments first
-        line = re.sub("(<!--.*?-->)", "", line)
+        line = RE_HTML_COMMENTS.sub("", line)
 
-        line_without_cats = re.sub(cls.re_match_toplines, '', line)
+        line_without_cats = cls.rx_match_toplines.sub('', line)
         if line_without_cats != line and line_without_cats.strip() == "":
             return True
 
@@ -257,10 +739,15 @@ class Section():
     def is_category(cls, line):
         # Returns True if a line contains at least one category and no text outside of the category templates or HTML comments
 
+        # Every category needs a template or a link
+        if "{{" not in line and "[[" not in line:
+            return False
+
         # Remove HTML comments first
-        line = re.sub("(<!--.*?-->)", "", line)
+        if "<!--" in line:
+            line = RE_HTML_COMMENTS.sub("", line)
 
-        line_without_cats = re.sub(cls.re_match_categories, '', line)
+        line_without_cats = cls.rx_match_categories.sub('', line)
         if line_without_cats != line and line_without_cats.strip() == "":
             return True
 
@@ -278,21 +765,25 @@ class Section():
             return True
 
     def add(self, item, state=None):
+        self._make_private()
+        self._add(item, state)
+
+    def _add(self, item, state=None, profile=None):
         if isinstance(item, str):
             # If the line is inside a template or html comment, just add it
             # without checking if it's a category or a topline
             if state:
-                self.content_wikilines.append(item)
+                self._content_wikilines.append(item)
 
-            elif re.match(r"^(----+)?\s*$", item):
-                if not self.content_wikilines:
+            elif RE_EMPTY_LINE.match(item):
+                if not self._content_wikilines:
                     # Ignore empty lines before first data item
                     self._leading_empty_lines.append(item)
                 else:
                     # buffer empty lines until there is a data line
                     self._trailing_empty_lines.append(item)
 
-            elif self.is_category(item):
+            elif timed(profile, "add.categories", self.is_category, item) if profile else self.is_category(item):
 
                 # if this is the first category, there should be one blank line before it
                 if not self._topmost._categories and self._trailing_empty_lines != [""]:
@@ -316,10 +807,10 @@ class Section():
 
             else:
                 if self._trailing_empty_lines:
-                    self.content_wikilines += self._trailing_empty_lines
+                    self._content_wikilines += self._trailing_empty_lines
                     self._trailing_empty_lines = []
 
-                self.content_wikilines.append(item)
+                self._content_wikilines.append(item)
 
                 # If any section before the final section contains a category, it will
                 # be moved to the bottom
@@ -337,6 +828,10 @@ class Section():
             self._topmost._toplines.append(line)
 
     def _add_category(self, line):
+        if not self._category_lines:
+            self._category_lines = []
+        self._category_lines.append(line)
+
         if line in self._topmost._categories:
             self._changes.append(f"/*{self._topmost.path}*/ removed duplicate categories")
         else:
@@ -365,10 +860,10 @@ class Section():
 
     @property
     def content_text(self):
-        if not self.content_wikilines:
+        if not self._content_wikilines:
             return ""
 
-        return "\n".join(self.content_wikilines) + "\n"
+        return "\n".join(self._content_wikilines) + "\n"
 
     @property
     def ancestors(self):
@@ -397,12 +892,94 @@ class Section():
         lineage = list(self.lineage)
         return lineage[-1]
 
+    def _page_text(self):
+        # Returns the text of the page this section was parsed from, if it is still known
+        root = self
+        while isinstance(root, Section):
+            root = root.parent
+        return getattr(root, "_text", None)
+
+    @property
+    def span(self):
+        """
+        (start, end) offsets of this section, including its subsections, in the page text
+        or None if the section or any section inside it was modified
+
+        Offsets index the page text after unicode paragraph separators are removed
+        """
+        if self._span is None or self._page_text() is None:
+            return
+
+        last = self
+        while last._children:
+            last = last._children[-1]
+        if last._span is None:
+            return
+
+        offset = self._topmost._offset
+        return offset + self._span[0], offset + last._span[2]
+
+    @property
+    def heading_span(self):
+        """ (start, end) offsets of the heading line in the page text, or None if the section was modified """
+        if self._span is None or self._page_text() is None:
+            return
+
+        offset = self._topmost._offset
+        return offset + self._span[0], offset + self._span[1]
+
+    @property
+    def raw_text(self):
+        """ The text of this section and its subsections as it appears in the page, or None if it was modified """
+        span = self.span
+        if span:
+            return self._page_text()[span[0]:span[1]]
+
+    def line_spans(self):
+        """
+        Returns a list with the (start, end) offsets in the page text of each line in
+        content_wikilines, or None if the section was modified
+        """
+        text = self._page_text()
+        if self._span is None or text is None:
+            return
+
+        offset = self._topmost._offset
+        start, heading_end, end = (offset + pos for pos in self._span)
+
+        # Text after the heading is added to the section like any other line
+        candidates = []
+        m = RE_HEADING.match(text[start:heading_end])
+        if m and m.group(4):
+            candidates.append((start + m.start(4), start + m.end(4)))
+
+        pos = heading_end + 1
+        for line in wiki_splitlines(text[pos:end]):
+            candidates.append((pos, pos + len(line)))
+            pos += len(line) + 1
+
+        # Empty lines and categories are not in content_wikilines, everything else
+        # should be in the same order as the page text
+        spans = []
+        lines = self._content_wikilines
+        for line_start, line_end in candidates:
+            if len(spans) < len(lines) and text[line_start:line_end] == lines[len(spans)]:
+                spans.append((line_start, line_end))
+
+        if len(spans) == len(lines):
+            return spans
+
     def ifilter_sections(self, recursive=True, matches=lambda x: True):
 
+        if not callable(matches) and not isinstance(matches, str):
+            yield from _ifilter_path(self, matches, recursive)
+            return
+
         if not callable(matches):
             match_title = matches
             matches = lambda x: x.title == match_title
 
+        _adopt_children(self)
         for child in self._children:
             if matches(child):
                 yield child
@@ -416,6 +993,7 @@ class Section():
         return self.header + self.toplines + self.content_text + "".join(list(map(str, self._children))) + self.categories
 
     def add_child(self, title, data=None, position=None):
+        self._make_private()
         new_child = Section(self, self.level+1, title, count=None)
 
         if not data:
@@ -434,11 +1012,118 @@ class Section():
         return new_child
 
     def add_line(self, item, position=None):
+        self._make_private()
         if position is not None:
-            self.content_wikilines.insert(position, item)
+            self._content_wikilines.insert(position, item)
         else:
             self.add(item)
 
     def add_text(self, text):
         for line in wiki_splitlines(text):
             self.add(line)
+
+    def replace_text(self, new_text):
+        """
+        Replaces the content and subsections of this section by parsing new_text, the
+        rest of the page is not reparsed
+
+        new_text = the new text of the section, with or without the heading line, eg.
+                   a modified str(section). Subsections must be at a deeper level than
+                   this section
+
+        Raises ValueError if new_text contains a heading at or above the level of this
+        section or an unclosed template or html comment
+        """
+
+        root = list(self.ancestors)[-1]
+        if not isinstance(root, SectionParser):
+            raise ValueError("section is not part of a page", self.path)
+
+        wikilines = list(wiki_splitlines(new_text.replace('\u2029', ""), return_state=True))
+        if wikilines.pop():
+            raise ValueError("new text has an unclosed template or html comment", self.path)
+
+        # The heading may be omitted, but if it's included it can change the title
+        title, count, heading_text = self.title, self.count, None
+        first_line = 0
+        for idx, wikiline in enumerate(wikilines):
+            m = RE_HEADING.match(wikiline)
+            if not m:
+                continue
+            level, new_title, new_count = _heading_parts(m)
+            if level == self.level and not any(l.strip() for l in wikilines[:idx]):
+                title, count, heading_text = new_title, new_count, m.group(4)
+                first_line = idx + 1
+            elif level <= self.level:
+                raise ValueError("new text has a heading at or above the section level", wikiline)
+
+        # Spans are needed to find the changes from the heading lines of subsections
+        next_level = _next_level(self)
+        old_changes = _subtree_changes(self, next_level)
+
+        self._make_private()
+
+        # The topmost section collects the categories in page order, drop the ones
+        # from the old subsections and those after it, they're added back after parsing
+        topmost = self._topmost
+        if topmost is not self:
+            sections = [topmost] + list(_owned_sections(topmost))
+            idx = next(i for i, section in enumerate(sections) if section is self)
+            following = sections[idx + 1 + len(list(self.ifilter_sections())):]
+            topmost._categories = []
+            for section in sections[:idx]:
+                topmost._categories += [l for l in section._category_lines if l not in topmost._categories]
+
+        # Parse into a detached section with the same parent so that categories
+        # are collected by the real topmost section
+        new_section = Section(self.parent, self.level, title, count)
+        wikilines = wikilines[first_line:]
+        if heading_text:
+            root.log("comment_on_title" if RE_HEADING_COMMENT.match(heading_text) else "text_on_title", self, heading_text)
+            new_section._add(heading_text)
+
+        # In the page text, a final newline is followed by the newline that ends the
+        # empty line before the next heading
+        if next_level and new_text.endswith("\n"):
+            wikilines.append("")
+
+        _, _, changes = root._parse_wikilines(wikilines, new_section, next_level=next_level)
+
+        self.title = title
+        self.count = count
+        self._content_wikilines = new_section._content_wikilines
+        self._leading_empty_lines = new_section._leading_empty_lines
+        self._trailing_empty_lines = new_section._trailing_empty_lines
+        self._changes = new_section._changes
+        self._category_lines = new_section._category_lines
+        self._children = new_section._children
+        self._cow_children = False
+
+        if topmost is self:
+            self._categories = new_section._categories
+            self._toplines = new_section._toplines
+
+        for child in self._children:
+            child.parent = self
+        for section in self.ifilter_sections():
+            section._topmost = self._topmost
+
+        # The changes of the old section and its subsections no longer apply
+        root._own_lines()
+        for change in old_changes:
+            if change in root._changes:
+                root._changes.remove(change)
+        root._changes += changes
+
+        # The changes about categories in the following sections depend on the categories before them
+        if topmost is not self:
+            for section in following:
+                replay = _reparse_lines(section)
+                if replay:
+                    for change in section._changes:
+                        if change in root._changes:
+                            root._changes.remove(change)
+                    section._changes = replay._changes
+                    section._category_lines = replay._category_lines
+                    root._changes += section._changes
+                topmost._categories += [l for l in section._category_lines if l not in topmost._categories]
@@ -0,0 +1,252 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compact storage for the list items of many POS sections
+
+    tree = SenseTree()
+    for section in sections:
+        tree.add(parser.parse_pos(section), key=section.path)
+
+    for item in tree.items("bare_ux"):
+        print(tree.key(item), item.name, item.data)
+
+Items are stored in parallel arrays in the order they appear in the page, with
+the text of every line in a single utf-8 buffer. Items are read through
+CompactListItem, a view with the same attributes as posparser.ListItem that
+is created when it's used, names are computed from the tree when they're read.
+"""
+
+import array
+import bisect
+
+
+class SenseTree():
+
+    def __init__(self):
+        # Per item
+        self._levels = array.array("B")      # length of the prefix
+        self._parents = array.array("i")     # index of the parent item, -1 for top level senses
+        self._types = array.array("B")       # index in _type_names
+        self._ends = array.array("q")        # end of the item's line in _text, the line starts at the previous end
+        self._subtree_ends = array.array("i")  # index of the first item after the item's subitems
+
+        self._text = bytearray()
+        self._type_names = []
+        self._type_codes = {}
+
+        # Per POS section
+        self._section_starts = array.array("i")
+        self._keys = []
+
+    def __len__(self):
+        return len(self._levels)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("item index out of range")
+        return CompactListItem(self, idx)
+
+    def __iter__(self):
+        return (CompactListItem(self, idx) for idx in range(len(self)))
+
+    def _type_code(self, item_type):
+        code = self._type_codes.get(item_type)
+        if code is None:
+            if len(self._type_names) > 255:
+                raise ValueError("too many item types", item_type)
+            code = len(self._type_names)
+            self._type_names.append(item_type)
+            self._type_codes[item_type] = code
+        return code
+
+    def add(self, pos, key=None):
+        """
+        Adds the senses of a PosParser and returns the index of the new section
+
+        key = optional value stored with the section, eg. the page title and section path
+        """
+        self._section_starts.append(len(self))
+        self._keys.append(key)
+
+        stack = [(item, -1) for item in reversed(list(pos.iter_senses()))]
+        while stack:
+            item, parent = stack.pop()
+            if item is None:
+                # All of the subitems of parent have been added
+                self._subtree_ends[parent] = len(self)
+                continue
+
+            idx = len(self)
+            self._text += (item.prefix + item.data).encode("utf-8")
+            self._levels.append(item.level)
+            self._parents.append(parent)
+            self._types.append(self._type_code(item._type))
+            self._ends.append(len(self._text))
+            self._subtree_ends.append(idx+1)
+
+            if item._children:
+                stack.append((None, idx))
+                stack += [(child, idx) for child in reversed(item._children)]
+
+        return len(self._keys) - 1
+
+    @property
+    def types(self):
+        """ Returns a list of the item types in the tree """
+        return list(self._type_names)
+
+    @property
+    def section_count(self):
+        return len(self._keys)
+
+    def key(self, item):
+        """ Returns the key of the section containing item """
+        return self._keys[self._section(item._idx)]
+
+    def senses(self, section):
+        """ Returns a list of the top level senses of a section """
+        start = self._section_starts[section]
+        end = self._section_starts[section+1] if section+1 < len(self._section_starts) else len(self)
+        return [CompactListItem(self, idx) for idx in self._siblings(start, end)]
+
+    def count(self, item_type):
+        """ Returns the number of items with the given type """
+        code = self._type_codes.get(item_type)
+        if code is None:
+            return 0
+        return self._types.count(code)
+
+    def items(self, item_type=None):
+        """ Yields every item, or only the items with the given type """
+        if item_type is None:
+            yield from self
+            return
+
+        code = self._type_codes.get(item_type)
+        if code is None:
+            return
+
+        # bytes.find() scans the type codes much faster than a loop over the array
+        types = self._types.tobytes()
+        code = bytes([code])
+        idx = types.find(code)
+        while idx != -1:
+            yield CompactListItem(self, idx)
+            idx = types.find(code, idx+1)
+
+    def _section(self, idx):
+        return bisect.bisect_right(self._section_starts, idx) - 1
+
+    def _siblings(self, start, end):
+        # Yields the index of every item from start to end without descending into subitems
+        subtree_ends = self._subtree_ends
+        idx = start
+        while idx < end:
+            yield idx
+            idx = subtree_ends[idx]
+
+    def _line(self, idx):
+        start = self._ends[idx-1] if idx else 0
+        return self._text[start:self._ends[idx]].decode("utf-8")
+
+    def _name(self, idx):
+        parent = self._parents[idx]
+        if parent < 0:
+            start = self._section_starts[self._section(idx)]
+        else:
+            start = parent + 1
+
+        count = 1 + sum(1 for _ in self._siblings(start, idx))
+
+        # Prefixes are ascii, so the style is a single byte
+        start = self._ends[idx-1] if idx else 0
+        style = chr(self._text[start + self._levels[idx] - 1])
+        prefix = self._name(parent) if parent >= 0 else ""
+        return prefix + style + str(count)
+
+
+class CompactListItem():
+
+    __slots__ = ("_tree", "_idx", "_features")
+
+    def __init__(self, tree, idx):
+        """
+        View of a single item in a SenseTree, with the same attributes as posparser.ListItem
+
+        tree = SenseTree
+        idx = index of the item in the tree
+        """
+        self._tree = tree
+        self._idx = idx
+        self._features = None
+
+    def __eq__(self, other):
+        return isinstance(other, CompactListItem) and self._tree is other._tree and self._idx == other._idx
+
+    def __hash__(self):
+        return hash((id(self._tree), self._idx))
+
+    def __repr__(self):
+        return f"CompactListItem({self._idx}, {self.name!r})"
+
+    @property
+    def parent(self):
+        parent = self._tree._parents[self._idx]
+        if parent >= 0:
+            return CompactListItem(self._tree, parent)
+
+    @property
+    def level(self):
+        return self._tree._levels[self._idx]
+
+    @property
+    def prefix(self):
+        return self._tree._line(self._idx)[:self.level]
+
+    @property
+    def style(self):
+        return self.prefix[-1]
+
+    @property
+    def data(self):
+        return self._tree._line(self._idx)[self.level:]
+
+    @property
+    def name(self):
+        return self._tree._name(self._idx)
+
+    @property
+    def _children(self):
+        tree = self._tree
+        return [CompactListItem(tree, idx) for idx in tree._siblings(self._idx+1, tree._subtree_ends[self._idx])]
+
+    @property
+    def _type(self):
+        return self._tree._type_names[self._tree._types[self._idx]]
+
+    @_type.setter
+    def _type(self, item_type):
+        self._tree._types[self._idx] = self._tree._type_code(item_type)
+
+    def __str__(self):
+        line = self._tree._line(self._idx)
+        text = line[:self.level] + " " + line[self.level:]
+        children = self._children
+        if children:
+            return text + "\n" + "\n".join(map(str, children))
+        return text
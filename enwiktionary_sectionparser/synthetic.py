@@ -0,0 +1,253 @@
+# Copyright (c) 2023 Jeff Doozan
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Deterministic generator of synthetic Wiktionary pages for benchmarks and stress tests
+
+    gen = PageGenerator(seed=1, languages=(1, 20), senses=(1, 30))
+    for text, title in gen.pages(1000):
+        ...
+
+The same seed and settings always produce the same pages, and page N does not
+depend on the pages generated before it.
+
+Ranges are (min, max) tuples, a random value between min and max (inclusive)
+is picked every time. Rates are probabilities between 0 and 1.
+"""
+
+import random
+import re
+
+from .sections import ALL_POS
+
+LANGUAGES = [
+    ("English", "en"), ("Spanish", "es"), ("French", "fr"), ("German", "de"), ("Italian", "it"),
+    ("Portuguese", "pt"), ("Dutch", "nl"), ("Swedish", "sv"), ("Finnish", "fi"), ("Polish", "pl"),
+    ("Czech", "cs"), ("Hungarian", "hu"), ("Turkish", "tr"), ("Latin", "la"), ("Ancient Greek", "grc"),
+    ("Ladino", "lad"), ("Esperanto", "eo"), ("Japanese", "ja"), ("Mandarin", "cmn"), ("Tagalog", "tl"),
+    ("Swahili", "sw"), ("Basque", "eu"), ("Welsh", "cy"), ("Irish", "ga"), ("Icelandic", "is"),
+]
+
+# Common POS headings are picked more often than rare ones
+COMMON_POS = ["Noun", "Noun", "Noun", "Verb", "Verb", "Adjective", "Adjective", "Adverb", "Proper noun"]
+ALL_POS_TITLES = sorted(ALL_POS)
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ta", "ri", "so", "vu", "de", "ban", "tor", "ell", "qui", "za", "pre", "st"]
+
+NYM_TEMPLATES = ["syn", "ant", "hyper", "hypo", "cot"]
+SENSE_TEMPLATES = ["lb", "q", "gloss"]
+CATEGORY_TEMPLATES = ["C", "topics", "cln"]
+
+
+class PageGenerator():
+
+    def __init__(self, seed=0,
+            languages=(1, 3),
+            etymologies=(1, 2),
+            pos_per_etymology=(1, 3),
+            senses=(1, 6),
+            subsenses=(0, 2),
+            list_depth=3,
+            template_density=0.5,
+            nested_template_rate=0.1,
+            quote_rate=0.3,
+            comment_rate=0.05,
+            category_rate=0.5,
+            unclosed_rate=0.0,
+            size=None):
+        """
+        seed = any int or string
+        languages = number of L2 sections per page
+        etymologies = number of Etymology sections per language, when more than 1 the
+                      POS sections are nested inside numbered Etymology N sections
+        pos_per_etymology = number of POS sections per etymology
+        senses = number of top level senses per POS
+        subsenses = number of ## subsenses per sense
+        list_depth = maximum depth of nested list items
+        template_density = chance of a sense line using templates instead of plain links
+        nested_template_rate = chance of a template being nested inside another template
+        quote_rate = chance of a sense having quotations and examples
+        comment_rate = chance of adding an html comment to a line
+        category_rate = chance of a language having categories
+        unclosed_rate = chance of a page containing an unclosed template or html comment
+        size = minimum page size in characters, languages are added until it is reached
+        """
+        self.seed = seed
+        self.languages = languages
+        self.etymologies = etymologies
+        self.pos_per_etymology = pos_per_etymology
+        self.senses = senses
+        self.subsenses = subsenses
+        self.list_depth = list_depth
+        self.template_density = template_density
+        self.nested_template_rate = nested_template_rate
+        self.quote_rate = quote_rate
+        self.comment_rate = comment_rate
+        self.category_rate = category_rate
+        self.unclosed_rate = unclosed_rate
+        self.size = size
+
+    def pages(self, count, start=0):
+        """ Yields count pages as (text, title) """
+        for idx in range(start, start+count):
+            yield self.page(idx)
+
+    def page(self, idx=0):
+        """ Returns page number idx as (text, title) """
+        rng = random.Random(f"{self.seed}:{idx}")
+        title = self._word(rng)
+
+        parts = []
+        if rng.random() < 0.3:
+            parts.append("{{also|" + title.capitalize() + "}}\n")
+
+        num_languages = rng.randint(*self.languages)
+        languages = rng.sample(LANGUAGES, min(num_languages, len(LANGUAGES)))
+        size = sum(len(p) for p in parts)
+        lang_idx = 0
+        while lang_idx < len(languages) or (self.size and size < self.size):
+            if lang_idx < len(languages):
+                lang, code = languages[lang_idx]
+            else:
+                lang, code = f"Language {lang_idx}", f"x{lang_idx}"
+            text = self._language(rng, title, lang, code)
+            parts.append(text)
+            size += len(text)
+            lang_idx += 1
+
+        text = "\n".join(parts)
+
+        if rng.random() < self.unclosed_rate:
+            # Insert before a random heading, an html comment is only unclosed
+            # if there are no later comments that would close it
+            pos = rng.choice([0] + [m.end() for m in re.finditer(r"\n(?===)", text)])
+            if rng.random() < 0.5 and "-->" not in text[pos:]:
+                text = text[:pos] + "<!-- unclosed comment\n" + text[pos:]
+            else:
+                text = text[:pos] + "{{unclosed|\n" + text[pos:]
+
+        return text, title
+
+    def _word(self, rng, syllables=(1, 4)):
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(*syllables)))
+
+    def _maybe_comment(self, rng, line):
+        if rng.random() < self.comment_rate:
+            if rng.random() < 0.2:
+                return line + "<!--\n" + self._word(rng) + "\n-->"
+            return line + "<!-- " + self._word(rng) + " -->"
+        return line
+
+    def _template(self, rng, name, code, *params):
+        params = list(params)
+        if params and rng.random() < self.nested_template_rate:
+            params[-1] = "{{w|" + params[-1] + "}}"
+        return "{{" + "|".join([name, code] + params) + "}}"
+
+    def _language(self, rng, title, lang, code):
+        lines = ["==" + lang + "=="]
+        num_etymologies = rng.randint(*self.etymologies)
+
+        for ety in range(1, num_etymologies+1):
+            if num_etymologies > 1:
+                lines += ["", f"===Etymology {ety}==="]
+                pos_level = 4
+            else:
+                lines += ["", "===Etymology==="]
+                pos_level = 3
+
+            lines.append("From " + self._template(rng, "inh", code, "la", self._word(rng)) + ".")
+
+            if ety == 1:
+                lines += ["", "="*pos_level + "Pronunciation" + "="*pos_level, "* {{IPA|" + code + "|/" + self._word(rng) + "/}}"]
+
+            for _ in range(rng.randint(*self.pos_per_etymology)):
+                lines.append("")
+                lines += self._pos(rng, title, code, pos_level)
+
+        if rng.random() < self.category_rate:
+            lines.append("")
+            for _ in range(rng.randint(1, 3)):
+                if rng.random() < 0.5:
+                    lines.append("[[Category:" + code + ":" + self._word(rng).capitalize() + "]]")
+                else:
+                    lines.append("{{" + rng.choice(CATEGORY_TEMPLATES) + "|" + code + "|" + self._word(rng).capitalize() + "}}")
+
+        return "\n".join(lines) + "\n"
+
+    def _pos(self, rng, title, code, level):
+        if rng.random() < 0.9:
+            pos = rng.choice(COMMON_POS)
+        else:
+            pos = rng.choice(ALL_POS_TITLES)
+
+        lines = ["="*level + pos + "="*level, "{{" + code + "-" + pos.lower().replace(" ", "-") + "}}", ""]
+        for _ in range(rng.randint(*self.senses)):
+            lines += self._sense(rng, title, code, "#", 1)
+
+        if rng.random() < 0.3:
+            nym_level = level + 1
+            lines += ["", "="*nym_level + "Synonyms" + "="*nym_level]
+            lines += ["* {{l|" + code + "|" + self._word(rng) + "}}" for _ in range(rng.randint(1, 4))]
+
+        return lines
+
+    def _definition(self, rng, code):
+        words = [self._word(rng) for _ in range(rng.randint(1, 8))]
+        words = ["[[" + w + "]]" if rng.random() < 0.3 else w for w in words]
+        text = " ".join(words)
+
+        if rng.random() < self.template_density:
+            text = self._template(rng, rng.choice(SENSE_TEMPLATES), code, self._word(rng)) + " " + text
+        return text
+
+    def _sense(self, rng, title, code, prefix, depth):
+        lines = [self._maybe_comment(rng, prefix + " " + self._definition(rng, code))]
+
+        if rng.random() < self.quote_rate:
+            lines += self._examples(rng, title, code, prefix)
+
+        if rng.random() < 0.2:
+            lines.append(prefix + ": " + self._template(rng, rng.choice(NYM_TEMPLATES), code, self._word(rng), self._word(rng)))
+
+        if depth < self.list_depth:
+            for _ in range(rng.randint(*self.subsenses) if depth == 1 else rng.randint(0, 1)):
+                lines += self._sense(rng, title, code, prefix + "#", depth+1)
+
+        return lines
+
+    def _examples(self, rng, title, code, prefix):
+        sentence = " ".join([self._word(rng).capitalize()] + [self._word(rng) for _ in range(rng.randint(2, 6))] + ["'''" + title + "'''"]) + "."
+        choice = rng.random()
+
+        if choice < 0.3:
+            return [prefix + ": " + self._template(rng, "ux", code, sentence)]
+
+        if choice < 0.5:
+            return [prefix + ": ''" + sentence + "''", prefix + ":: " + sentence]
+
+        if choice < 0.8:
+            year = rng.randint(1500, 2020)
+            return [prefix + "* {{quote-book|" + code + "|year=" + str(year) + "|author=" + self._word(rng).capitalize()
+                    + "|title=" + self._word(rng).capitalize() + "|passage=" + sentence + "}}"]
+
+        year = rng.randint(1500, 2020)
+        return [prefix + "* '''" + str(year) + "''', " + self._template(rng, "w", code, self._word(rng).capitalize()) + ", ''" + self._word(rng) + "'':",
+                prefix + "*: " + sentence]
+
+
+def generate_pages(count, seed=0, **kwargs):
+    """ Yields count (text, title) pages, see PageGenerator for the options """
+    return PageGenerator(seed, **kwargs).pages(count)
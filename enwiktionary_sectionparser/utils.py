@@ -13,46 +13,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import functools
 import re
 
-def wiki_finditer(pattern, text, flags=0, invert_matches=False, match_comments=False, match_nowiki=False, match_ref=False, match_math=False, match_pre=False, match_table=False, match_templates=False, match_links=False, match_special_links=False, return_final_state=False):
-
-    """
-    matches pattern within wiki formatted text, with basic awareness
-    of wiki elements (templates, html comments, tags, tables, etc)
-
-    by default, only match text outside of wikielements, set match_*=True to enable matching inside specific elements
-
-    ``match_templates`` - if set to ``True``, match inside all templates, if a list of names, only match inside the given templates
-
-    if invert_matches is set, it will return only instances where pattern would be discarded for being inside the non-permitted wiki elements
-
-    NOTE: never matches inside a wikilink target like [[link]] or [[link#anchor|test]]
-    """
-
-    in_comment = False
-    in_nowiki  = False
-    in_ref = False
-    in_math = False
-    in_pre = False
-    in_table = False
-    in_link = False
-    in_special_link = False
-    template_stack = []
-
-
-    def get_state():
-        return {k:v for k, v in [
-            ("open_ref", in_ref),
-            ("open_nowiki", in_nowiki),
-            ("open_comment", in_comment),
-            ("open_math", in_math),
-            ("open_pre", in_pre),
-            ("open_table", in_table),
-            ("open_link", in_link),
-            ("open_special", in_special_link),
-            ("open_templates", template_stack),
-        ] if v}
+# The compiled patterns are shared by every call to wiki_finditer with the same options
+@functools.lru_cache(maxsize=256)
+def _compile_wiki_pattern(pattern, flags, match_comments, match_nowiki, match_ref, match_math, match_pre, match_table, match_templates):
 
     separators = []
     tags = []
@@ -72,14 +38,14 @@ def wiki_finditer(pattern, text, flags=0, invert_matches=False, match_comments=F
         separators += [r"{{", "}}"]
 
     if pattern in separators:
-        raise ValueError(f"Invalid search value: {start}")
+        raise ValueError(f"Invalid search value: {pattern}")
 
     match_items = ["(?P<_pat>" + pattern + ")"]
 
     if separators:
         match_items.append("(?P<_sep>" + "|".join(separators) + ")")
 
-    if isinstance(match_templates, list):
+    if isinstance(match_templates, tuple):
         # When given a list of templates that should allow their contents to be matched,
         # capture the template name when matching {{
         template_start = r"(?P<_tmpl_start>{{(\s*|<--.*-->)*(?P<_tmpl_name>[^\n|}{]*?)(\s*|<!--.*-->)*(?=[}|]))"
@@ -97,14 +63,57 @@ def wiki_finditer(pattern, text, flags=0, invert_matches=False, match_comments=F
     # Always consume links [[ ]] targets, never allow matching inside the link target
     match_items.append(r"(?P<_link_start>\[\[)(?P<_link_target>.*?(?=[|\]]))|(?P<_link_end>\]\])")
 
-    pattern = "|".join(match_items)
+    return re.compile("|".join(match_items), flags), bool(tags), bool(separators)
+
+def wiki_finditer(pattern, text, flags=0, invert_matches=False, match_comments=False, match_nowiki=False, match_ref=False, match_math=False, match_pre=False, match_table=False, match_templates=False, match_links=False, match_special_links=False, return_final_state=False):
+
+    """
+    matches pattern within wiki formatted text, with basic awareness
+    of wiki elements (templates, html comments, tags, tables, etc)
+
+    by default, only match text outside of wikielements, set match_*=True to enable matching inside specific elements
+
+    ``match_templates`` - if set to ``True``, match inside all templates, if a list of names, only match inside the given templates
+
+    if invert_matches is set, it will return only instances where pattern would be discarded for being inside the non-permitted wiki elements
+
+    NOTE: never matches inside a wikilink target like [[link]] or [[link#anchor|test]]
+    """
+
+    in_comment = False
+    in_nowiki  = False
+    in_ref = False
+    in_math = False
+    in_pre = False
+    in_table = False
+    in_link = False
+    in_special_link = False
+    template_stack = []
 
-    start_pos = None
-    for m in re.finditer(pattern, text, flags):
+
+    def get_state():
+        return {k:v for k, v in [
+            ("open_ref", in_ref),
+            ("open_nowiki", in_nowiki),
+            ("open_comment", in_comment),
+            ("open_math", in_math),
+            ("open_pre", in_pre),
+            ("open_table", in_table),
+            ("open_link", in_link),
+            ("open_special", in_special_link),
+            ("open_templates", template_stack),
+        ] if v}
+
+    template_names = tuple(match_templates) if isinstance(match_templates, list) else bool(match_templates)
+    wiki_pattern, tags, separators = _compile_wiki_pattern(pattern, flags, match_comments, match_nowiki,
+            match_ref, match_math, match_pre, match_table, template_names)
+
+    for m in wiki_pattern.finditer(text):
 
         if m.group("_pat"):
-            state = get_state()
-            if bool(state) == bool(invert_matches):
+            is_open = in_ref or in_nowiki or in_comment or in_math or in_pre or in_table \
+                    or in_link or in_special_link or template_stack
+            if bool(is_open) == bool(invert_matches):
                 yield m
             continue
 
@@ -222,6 +231,133 @@ def wiki_finditer(pattern, text, flags=0, invert_matches=False, match_comments=F
     if return_final_state:
         yield get_state()
 
+# The tokens recognized by wiki_finditer() with the default options, as plain literals
+# so the regex engine can skip text quickly, the lookarounds are checked separately
+_TAG_PATTERN = re.compile(r"(?i:<\s*(?P<_tag_start>nowiki|ref|math|pre)(?:\s[^/>]*)?>|<\s*\/\s*(?P<_tag_end>nowiki|ref|math|pre)\s*>|<\s*(?P<_single_tag>nowiki|ref|math|pre)\b[^/>]*[/]\s*>)")
+_LINK_TARGET_PATTERN = re.compile(r".*?(?=[|\]])")
+
+@functools.lru_cache(maxsize=32)
+def _compile_line_start_pattern(prefix, skip_closed):
+    # When skip_closed is set, simple templates and links that are opened and closed
+    # on the same line are matched as a single token
+    closed = r"\{\{[^{}<\[\]\n]*\}\}|\[\[[^\n|\]:]*\]\]|" if skip_closed else ""
+    return re.compile(r"\n" + re.escape(prefix) + "|" + closed + r"<!--|-->|\{[{|]|\|\}|}}|<|\[\[|\]\]")
+
+def wiki_line_starts(text, prefix):
+    """
+    Returns a list with the offset of every line in text that starts with prefix and
+    is not inside a wiki element, using the same rules as wiki_splitlines()
+
+    Much faster than checking every line from wiki_splitlines() when only a few lines
+    are of interest
+    """
+
+    res = [0] if text.startswith(prefix) else []
+
+    in_comment = in_nowiki = in_ref = in_math = in_pre = in_table = in_link = in_special_link = False
+    template_depth = 0
+
+    search_all = _compile_line_start_pattern(prefix, False).search
+    search_closed = _compile_line_start_pattern(prefix, True).search
+    pos = 0
+    while True:
+        # Inside comments, <math> and <pre> every token must be checked for the closing tag
+        m = search_all(text, pos) if in_comment or in_math or in_pre else search_closed(text, pos)
+        if not m:
+            break
+        start = m.start()
+        cmd = m.group()
+        pos = m.end()
+
+        if cmd[0] == "\n":
+            pos = start + 1
+            if not (in_ref or in_nowiki or in_comment or in_math or in_pre or in_table
+                    or in_link or in_special_link or template_depth):
+                res.append(pos)
+            continue
+
+        # A closed template has no effect, a closed link closes any open link
+        elif len(cmd) > 2 and cmd[0] in "{[":
+            if cmd[0] == "[":
+                in_link = False
+            continue
+
+        elif cmd == "<":
+            tag = _TAG_PATTERN.match(text, start)
+            if not tag or tag.group("_single_tag"):
+                continue
+            pos = tag.end()
+            cmd = tag.group("_tag_start").lower() if tag.group("_tag_start") else "/" + tag.group("_tag_end").lower()
+
+        elif cmd == "[[":
+            target = _LINK_TARGET_PATTERN.match(text, pos)
+            if not target:
+                pos = start + 1
+                continue
+            pos = target.end()
+            link = target.group().strip().lstrip(":").lower()
+            if link.startswith("file:") or link.startswith("image:"):
+                cmd = "[[special"
+
+        elif cmd == "{|" and start and text[start-1] == "{":
+            pos = start + 1
+            continue
+
+        elif cmd == "|}" and text.startswith("}", pos):
+            pos = start + 1
+            continue
+
+        # Same state changes as wiki_finditer()
+        if in_comment:
+            if cmd == "-->":
+                in_comment = False
+            continue
+
+        if in_math:
+            if cmd == "/math":
+                in_math = False
+            continue
+
+        if in_pre:
+            if cmd == "/pre":
+                in_pre = False
+            continue
+
+        if cmd == "<!--":
+            in_comment = True
+        elif cmd == "/nowiki":
+            in_nowiki = False
+        elif cmd == "{|":
+            in_table = True
+        elif cmd == "|}":
+            in_table = False
+        elif cmd == "[[special":
+            in_special_link = True
+        elif cmd == "[[":
+            in_link = True
+        elif cmd == "]]":
+            if in_link:
+                in_link = False
+            elif in_special_link:
+                in_special_link = False
+        elif cmd == "{{":
+            template_depth += 1
+        elif cmd == "}}":
+            if template_depth:
+                template_depth -= 1
+        elif cmd == "nowiki":
+            in_nowiki = True
+        elif cmd == "ref":
+            in_ref = True
+        elif cmd == "/ref":
+            in_ref = False
+        elif cmd == "math":
+            in_math = True
+        elif cmd == "pre":
+            in_pre = True
+
+    return res
+
 def wiki_splitlines(text, return_state=False, **kwargs):
     prev_pos = 0
 
@@ -331,3 +467,180 @@ def wiki_replace(pattern, replacement, text, regex=False, **kwargs):
         parts.append(text[prev_pos:])
 
     return "".join(parts)
+
+# Inline html tags that don't change how templates are parsed, any other tag
+# may hide braces (<nowiki>, <pre>, <math>) and needs a full parser
+_INLINE_TAGS = {"br", "sup", "sub", "span", "b", "i", "u", "s", "small", "big", "ref", "abbr", "q", "em", "strong", "del", "ins"}
+_TEMPLATE_TOKENS = re.compile(r"\{\{\{|\{\{|\}\}|\[\[|\]\]|[\[\]]|<!--|<\s*(/?)\s*([A-Za-z]+)|''+|\{\|")
+_TAG_END = re.compile(r"[^<>]*?(/?)\s*>")
+_TEMPLATE_NAME = re.compile(r"\{\{(\s*[^{}\[\]<>|\n]*?\s*)(?=\||\}\})")
+_PARAM_TOKENS = re.compile(r"\{\{|\}\}|\[\[|\]\]|<!--|\|")
+
+class TemplateSpan():
+    """ A template found by scan_templates(), with the same name, has() and str() as a mwparserfromhell Template """
+
+    __slots__ = ("name", "start", "end", "_text")
+
+    def __init__(self, text, start, end, name):
+        self._text = text
+        self.start = start
+        self.end = end
+        self.name = name
+
+    def __str__(self):
+        return self._text[self.start:self.end]
+
+    def __repr__(self):
+        return f"TemplateSpan({str(self)!r})"
+
+    @property
+    def params(self):
+        """ List of the template parameters, as text """
+        text = self._text
+        params = []
+        depth = 0
+        param_start = None
+        pos = self.start + 2
+        end = self.end - 2
+        while True:
+            m = _PARAM_TOKENS.search(text, pos, end)
+            if not m:
+                break
+            tok = m.group()
+            pos = m.end()
+            if tok == "<!--":
+                pos = text.find("-->", pos, end)
+                if pos < 0:
+                    break
+                pos += 3
+            elif tok in ("{{", "[["):
+                depth += 1
+            elif tok in ("}}", "]]"):
+                depth = max(depth - 1, 0)
+            elif not depth:
+                if param_start is not None:
+                    params.append(text[param_start:m.start()])
+                param_start = pos
+
+        if param_start is not None:
+            params.append(text[param_start:end])
+        return params
+
+    def has(self, name):
+        """ Returns True if the template has a parameter called name, positional parameters are named 1, 2, ... """
+        name = name.strip()
+        positional = 0
+        for param in self.params:
+            # = inside a nested template or link doesn't name the parameter
+            key = param.split("=", 1)[0]
+            if "=" in param and "{{" not in key and "[[" not in key:
+                key = key.strip()
+            else:
+                positional += 1
+                key = str(positional)
+            if key == name:
+                return True
+        return False
+
+def scan_templates(text, recursive=False):
+    """
+    Returns a list of the TemplateSpan for each top level template in text, or
+    for every template if recursive is set
+
+    Returns None when the markup is ambiguous (unclosed templates, template
+    parameters, templates inside links, formatting or headings, <nowiki> and
+    similar tags), those should be parsed with mwparserfromhell instead
+    """
+
+    # mwparserfromhell parses a line like ={{foo}}= as a heading
+    if text.startswith("=") or "\n=" in text:
+        return
+
+    templates = []
+    stack = []      # (token, start) for open {{ and [[
+    brackets = 0    # unclosed [ outside of templates
+    styles = 0      # open ''italics'' and '''bold''' outside of templates, as bits
+    tags = {}       # number of open html tags outside of templates
+
+    search = _TEMPLATE_TOKENS.search
+    pos = 0
+    while True:
+        m = search(text, pos)
+        if not m:
+            break
+        tok = m.group()
+        start = m.start()
+        pos = m.end()
+
+        if tok == "<!--":
+            end = text.find("-->", pos)
+            if end < 0:
+                return
+            pos = end + 3
+
+        elif tok == "{{":
+            # A template inside a link, an external link, formatting or a tag is not at the top level
+            if not recursive and ((stack and stack[-1][0] == "[[") or (not stack and (brackets or styles or any(tags.values())))):
+                return
+            stack.append((tok, start))
+
+        elif tok == "}}":
+            if not stack:
+                continue
+            if stack[-1][0] != "{{":
+                return
+            _, tmpl_start = stack.pop()
+            if recursive or not stack:
+                name = _TEMPLATE_NAME.match(text, tmpl_start)
+                if not name or not name.group(1).strip() or "''" in name.group(1):
+                    return
+                # Templates directly after a url are part of the link
+                if not recursive and tmpl_start and not text[tmpl_start-1].isspace() and "://" in text[:tmpl_start]:
+                    return
+                templates.append(TemplateSpan(text, tmpl_start, pos, name.group(1)))
+
+        elif tok == "[[":
+            stack.append((tok, start))
+
+        elif tok == "]]":
+            if stack and stack[-1][0] == "[[":
+                stack.pop()
+            elif not stack:
+                brackets = max(brackets - 2, 0)
+
+        elif tok == "[":
+            if not stack:
+                brackets += 1
+
+        elif tok == "]":
+            if not stack:
+                brackets = max(brackets - 1, 0)
+
+        elif tok[0] == "'":
+            if not stack:
+                # Runs of 4 or more than 5 quotes are ambiguous, they're treated as never closed
+                styles = (styles ^ {2: 1, 3: 2, 5: 3}.get(len(tok), 4)) | (styles & 4)
+
+        elif tok[0] == "<":
+            tag = m.group(2).lower()
+            tag_end = _TAG_END.match(text, pos)
+            if tag not in _INLINE_TAGS or not tag_end:
+                return
+            pos = tag_end.end()
+            if not stack and tag != "br" and not tag_end.group(1):
+                if m.group(1):
+                    tags[tag] = max(tags.get(tag, 0) - 1, 0)
+                else:
+                    tags[tag] = tags.get(tag, 0) + 1
+
+        # {{{parameters}}} and tables
+        else:
+            return
+
+    if any(tok == "{{" for tok, _ in stack):
+        return
+
+    if recursive:
+        templates.sort(key=lambda t: t.start)
+
+    return templates
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.aio import aparse_stream
+
+PAGES = [(f"==English==\n===Noun===\n# test {i}\n", f"test{i}") for i in range(10)]
+PAGES.insert(3, ("==English==\n{{unclosed\n", "unclosed"))
+
+async def async_pages(pages):
+    for page in pages:
+        await asyncio.sleep(0)
+        yield page
+
+def test_stream():
+    async def run():
+        with ThreadPoolExecutor(2) as executor:
+            return [(title, str(entry) if entry else None)
+                    async for title, entry in aparse_stream(async_pages(PAGES), executor=executor)]
+
+    expected = []
+    for text, title in PAGES:
+        entry = parser.parse(text, title)
+        expected.append((title, str(entry) if entry else None))
+
+    assert asyncio.run(run()) == expected
+
+def test_process_pool():
+    async def run():
+        return [title async for title, entry in aparse_stream(PAGES, workers=2) if entry]
+
+    assert asyncio.run(run()) == [title for _, title in PAGES if title != "unclosed"]
+
+def test_backpressure():
+    release = threading.Event()
+
+    def blocking_parse(text, title):
+        release.wait()
+        return title
+
+    async def run():
+        read = []
+        async def source():
+            for text, title in PAGES:
+                read.append(title)
+                yield text, title
+
+        with ThreadPoolExecutor(4) as executor:
+            stream = aparse_stream(source(), executor=executor, max_pending=3, func=blocking_parse)
+            results = stream.__aiter__()
+            first = asyncio.ensure_future(results.__anext__())
+            await asyncio.sleep(0.05)
+
+            # The source isn't read while max_pending pages are being parsed
+            assert stream.in_flight == 3
+            assert len(read) == 3
+
+            release.set()
+            titles = [await first] + [item async for item in results]
+            assert stream.in_flight == 0
+            return titles
+
+    assert asyncio.run(run()) == [(title, title) for _, title in PAGES]
+
+def test_cancel():
+    release = threading.Event()
+
+    def blocking_parse(text, title):
+        release.wait(1)
+        return title
+
+    async def run():
+        with ThreadPoolExecutor(1) as executor:
+            stream = aparse_stream(PAGES, executor=executor, max_pending=4, func=blocking_parse)
+            task = asyncio.ensure_future(stream.__aiter__().__anext__())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            release.set()
+            return stream.in_flight
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,37 @@
+import io
+from benchmarks.run import run, compare, main
+from benchmarks.imports import measure_import, main as imports_main, LAZY_MODULES
+
+def test_run():
+    res = run(match="*/small", min_time=0, min_samples=2, out=io.StringIO())
+    assert "parse/small" in res["results"]
+    assert "parse/typical" not in res["results"]
+    assert res["results"]["parse/small"]["samples"] >= 2
+
+def test_compare():
+    baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}}}
+    current = {"results": {"a": {"median": 1.05}, "b": {"median": 1.5}, "d": {"median": 9}}}
+    assert compare(current, baseline, 0.1) == [("b", 1.0, 1.5, 1.5)]
+    assert compare(current, baseline, 0.6) == []
+
+def test_main(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    args = ["--match", "serialize/small", "--min-time", "0", "--min-samples", "2"]
+    assert main(args + ["--save", baseline]) == 0
+    assert main(args + ["--compare", baseline, "--threshold", "100"]) == 0
+
+def test_compare_field():
+    baseline = {"results": {"a": {"median": 1.0, "peak": 100}}}
+    current = {"results": {"a": {"median": 1.0, "peak": 200}}}
+    assert compare(current, baseline, 0.1) == []
+    assert compare(current, baseline, 0.1, "peak") == [("a", 100, 200, 2.0)]
+
+def test_lazy_imports():
+    elapsed, modules = measure_import()
+    assert "enwiktionary_sectionparser.sectionparser" in modules
+    for module in LAZY_MODULES:
+        assert module not in modules
+
+def test_imports_main():
+    assert imports_main(["--samples", "1", "--budget", "100"]) == 0
+    assert imports_main(["--samples", "1", "--budget", "0"]) == 1
@@ -0,0 +1,117 @@
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.cache import SqliteCache, dumps, loads
+
+TEXT = """\
+{{also|Test}}
+==English==
+[[Category:en:Test]]
+
+===Etymology 1===
+blah
+
+====Noun====
+{{en-noun}}
+
+# test
+
+==Spanish==
+
+===Noun===
+{{es-noun|m}}
+# [[test]]
+{{c|es|Test}}
+"""
+
+def test_roundtrip():
+    entry = parser.parse(TEXT, "test")
+    loaded = loads(dumps(entry), "test")
+
+    assert str(loaded) == str(entry)
+    assert loaded.changelog == entry.changelog
+    assert [s.path for s in loaded.filter_sections()] == [s.path for s in entry.filter_sections()]
+
+    # Spans are only available when the page text is given
+    assert loaded.filter_sections()[0].span is None
+    loaded_with_text = loads(dumps(entry), "test", text=TEXT)
+    assert [s.span for s in loaded_with_text.filter_sections()] == [s.span for s in entry.filter_sections()]
+    assert loaded_with_text.filter_sections(matches="Spanish")[0].raw_text == TEXT[TEXT.index("==Spanish=="):-1]
+
+    # The loaded tree should be editable just like a parsed one
+    english = loaded.filter_sections(matches="English")[0]
+    noun = loaded.filter_sections(matches="Noun")[0]
+    assert noun._topmost is english
+    noun.add_line("[[Category:en:Other]]")
+    assert str(loaded).count("[[Category:en:Other]]") == 1
+
+def test_parse_cache():
+    cache = SqliteCache(":memory:")
+
+    entry = parser.parse(TEXT, "test", cache=cache)
+    assert cache.misses == 1 and cache.hits == 0
+
+    cached = parser.parse(TEXT, "other title", cache=cache)
+    assert cache.hits == 1
+    assert cached.title == "other title"
+    assert str(cached) == str(entry)
+
+def test_unsafe_page():
+    cache = SqliteCache(":memory:")
+    text = "==English==\n{{unclosed\n"
+
+    assert parser.parse(text, "test", cache=cache) is None
+    assert parser.parse(text, "test", cache=cache) is None
+    assert cache.hits == 1
+
+    # the cache is bypassed when logging
+    assert parser.parse(text, "test", log=[], cache=cache) is not None
+
+def test_eviction():
+    cache = SqliteCache(":memory:", max_entries=2)
+    for i in range(5):
+        parser.parse(TEXT + str(i), "test", cache=cache)
+    assert len(cache) == 2
+
+    # the most recently used entries survive
+    parser.parse(TEXT + "3", "test", cache=cache)
+    assert cache.hits == 1
+
+    cache = SqliteCache(":memory:", max_bytes=2000)
+    for i in range(10):
+        parser.parse(TEXT + str(i), "test", cache=cache)
+    assert 0 < cache.size <= 2000
+
+def test_shared_file(tmp_path):
+    filename = str(tmp_path / "cache.db")
+    first = SqliteCache(filename, max_bytes=1000)
+    second = SqliteCache(filename)
+
+    # Entries added by the other connection count towards the limits
+    first.set(b"a", b"x" * 400)
+    second.set(b"b", b"x" * 400)
+    first.set(b"c", b"x" * 400)
+    assert len(first) == 2 and first.size == 800
+
+    # Entries removed by the other connection don't leave stale totals behind
+    first.set(b"d", b"x" * 900)
+    second.clear()
+    first.set(b"e", b"x" * 200)
+    assert len(first) == 1 and first.size == 200
+
+    # A cache hit doesn't keep the file locked
+    assert first.get(b"e") == b"x" * 200
+    second.set(b"f", b"x" * 100)
+    assert second.get(b"e") == b"x" * 200
+    first.set(b"g", b"x" * 100)
+
+    first.close()
+    second.close()
+
+def test_persistent(tmp_path):
+    filename = str(tmp_path / "cache.db")
+    with SqliteCache(filename) as cache:
+        parser.parse(TEXT, "test", cache=cache)
+
+    with SqliteCache(filename) as cache:
+        assert len(cache) == 1
+        assert str(parser.parse(TEXT, "test", cache=cache)) == str(parser.parse(TEXT, "test"))
+        assert cache.hits == 1
@@ -0,0 +1,68 @@
+from enwiktionary_sectionparser.index import SectionIndex, build_index, page_sections
+
+SPANISH = """\
+==Spanish==
+
+===Etymology 1===
+
+====Verb====
+# test
+
+===Etymology 2===
+
+====Noun====
+# test
+"""
+
+LADINO = """\
+==Ladino==
+
+===Noun===
+# test
+
+==Spanish==
+
+===Verb===
+# test
+"""
+
+def test_page_sections():
+    assert list(page_sections("===Orphan===\n==Ladino==\n===Noun===\n")) == [
+        ("Orphan", None, None, 0),
+        ("Ladino", "Ladino", None, 13),
+        ("Ladino:Noun", "Ladino", "Noun", 24),
+    ]
+
+def test_index():
+    with SectionIndex(":memory:") as index:
+        assert index.update([(SPANISH, "uno"), (LADINO, "dos")]) == 2
+        assert len(index) == 2
+        assert "uno" in index
+
+        assert index.titles(language="Spanish", pos="Verb") == ["dos", "uno"]
+        assert index.titles(language="Ladino") == ["dos"]
+        assert index.titles(pos="Noun") == ["dos", "uno"]
+        assert index.titles(path="Spanish:Etymology 2:Noun") == ["uno"]
+        assert index.find(language="Spanish", pos="Verb") == [
+            ("dos", "Spanish:Verb", LADINO.index("===Verb")),
+            ("uno", "Spanish:Etymology 1:Verb", SPANISH.index("====Verb")),
+        ]
+        assert index.languages() == [("Ladino", 1), ("Spanish", 2)]
+
+def test_incremental(tmp_path):
+    filename = str(tmp_path / "index.db")
+    build_index(filename, [(SPANISH, "uno"), (LADINO, "dos")])
+
+    with SectionIndex(filename) as index:
+        # Unchanged pages are skipped
+        assert index.update([(SPANISH, "uno"), (LADINO, "dos")]) == 0
+
+        assert index.update([(LADINO, "uno"), ("==English==\n", "tres")], remove_missing=True) == 2
+        assert "dos" not in index
+        assert index.titles(path="Spanish:Etymology 1:Verb") == []
+        assert index.titles(language="Ladino") == ["uno"]
+        assert index.titles(language="English") == ["tres"]
+
+        index.remove("tres")
+        assert len(index) == 1
+        assert index.languages() == [("Ladino", 1), ("Spanish", 1)]
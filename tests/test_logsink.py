@@ -0,0 +1,83 @@
+import json
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.logsink import LogRecord, ListSink, CountingSink, SamplingSink, RingBufferSink
+
+TEXT = """\
+==English==
+===Noun=== text
+# test
+===Verb=== <!-- comment -->
+# test
+"""
+
+def test_list():
+    log = []
+    entry = parser.parse(TEXT, "test", log)
+    expected = [
+        ("text_on_title", "test:English:Noun", "===Noun=== text"),
+        ("comment_on_title", "test:English:Verb", "===Verb=== <!-- comment -->"),
+    ]
+    assert log == expected
+
+    # Lists get plain tuples that don't change with the tree
+    assert json.loads(json.dumps(log)) == [list(item) for item in expected]
+    entry.filter_sections(matches="Noun")[0].title = "Adjective"
+    assert log == expected
+
+def test_records():
+    sink = ListSink(records=True)
+    parser.parse(TEXT, "test", sink)
+    log = sink.items
+
+    code, path, line = log[0]
+    assert path == "test:English:Noun"
+    assert log[1].code == "comment_on_title"
+    assert log[1].section.title == "Verb"
+    assert TEXT[slice(*log[1].span)] == "===Verb=== <!-- comment -->"
+
+def test_lazy_path():
+    class Section():
+        title = "test"
+        @property
+        def lineage(self):
+            raise AssertionError("path formatted")
+
+    record = LogRecord("code", Section(), "line")
+    assert record.code == "code"
+
+    sink = ListSink(records=True)
+    sink("code", Section(), "line")
+    assert len(sink.items) == 1
+
+def test_callable():
+    messages = []
+    parser.parse(TEXT, "test", lambda code, section, line: messages.append((code, section.title)))
+    assert messages == [("text_on_title", "Noun"), ("comment_on_title", "Verb")]
+
+def test_counting():
+    sink = CountingSink()
+    for _ in range(3):
+        parser.parse(TEXT, "test", sink)
+    assert sink.counts == {"text_on_title": 3, "comment_on_title": 3}
+
+def test_sampling():
+    sink = CountingSink()
+    sampler = SamplingSink(sink, 0.5, seed=1)
+    for _ in range(100):
+        parser.parse(TEXT, "test", sampler)
+    assert 50 < sum(sink.counts.values()) < 150
+
+    log = []
+    parser.parse(TEXT, "test", SamplingSink(log, 1))
+    assert len(log) == 2
+
+def test_ring_buffer():
+    sink = RingBufferSink(3)
+    for idx in range(5):
+        parser.parse(TEXT, f"test{idx}", sink)
+    assert [path for _, path, _ in sink.items] == ["test3:English:Verb", "test4:English:Noun", "test4:English:Verb"]
+
+    sink = RingBufferSink(3, records=True)
+    for idx in range(5):
+        parser.parse(TEXT, f"test{idx}", sink)
+    assert [record.path for record in sink.items] == ["test3:English:Verb", "test4:English:Noun", "test4:English:Verb"]
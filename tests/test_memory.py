@@ -0,0 +1,52 @@
+import io
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.memory import memory_report
+from benchmarks.memory import run, main
+
+TEXT = """==English==
+
+===Noun===
+{{en-noun}}
+
+# {{lb|en|rare}} A [[test]].
+## A sub test.
+#: {{ux|en|This is a test.}}
+
+[[Category:en:Tests]]
+"""
+
+def test_memory_report():
+    entry = parser.parse(TEXT, "test")
+    report = memory_report(entry)
+    assert report.counts["SectionParser"] == 1
+    assert report.counts["Section"] == 2
+    assert report.total == sum(report.sizes.values())
+    assert report.ratio(TEXT) > 1
+    assert "Section" in report.format()
+
+    # Shared objects are only counted once
+    assert memory_report(entry, entry).total == report.total
+
+def test_memory_report_pos():
+    entry = parser.parse(TEXT, "test")
+    pos = parser.parse_pos(entry.filter_sections(matches="Noun")[0])
+    report = memory_report(pos, exclude=[entry])
+    assert report.counts["ListItem"] == 3
+    assert "Section" not in report.counts
+    assert "SectionParser" not in report.counts
+
+    # The shared type cache isn't part of the parser
+    warm = memory_report(parser.parse_pos(entry.filter_sections(matches="Noun")[0]), exclude=[entry])
+    assert warm.counts == report.counts
+
+def test_run():
+    res = run(match="*/small", out=io.StringIO())
+    assert set(res["results"]) == {"parse/small", "parse_pos/small", "sense_tree/small"}
+    assert res["results"]["parse/small"]["peak"] > 0
+    assert res["results"]["parse/small"]["deep_size"] > 0
+
+def test_main(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    args = ["--match", "parse/small"]
+    assert main(args + ["--save", baseline]) == 0
+    assert main(args + ["--compare", baseline, "--threshold", "100"]) == 0
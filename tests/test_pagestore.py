@@ -0,0 +1,64 @@
+import pickle
+import pytest
+from enwiktionary_sectionparser.pagestore import PageStore, PageStoreWriter, build_pagestore
+
+PAGES = [
+    ("test", "==English==\n===Noun===\n# test\n"),
+    ("árbol", "==Spanish==\n===Noun===\n{{es-noun|m}}\n\n# [[tree]]\n"),
+    ("a", "==Translingual==\n===Letter===\n# a\n"),
+    ("unclosed", "==English==\n{{foo\n===Noun===\n# test\n"),
+    ("empty", ""),
+]
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "pages.dat")
+    build_pagestore(path, PAGES)
+    with PageStore(path) as store:
+        yield store
+
+def test_lookup(store):
+    assert len(store) == len(PAGES)
+    for title, text in PAGES:
+        assert title in store
+        assert store[title] == text
+
+    assert "missing" not in store
+    assert store.get("missing") is None
+    with pytest.raises(KeyError):
+        store["missing"]
+
+def test_titles(store):
+    assert list(store.titles()) == sorted(title for title, _ in PAGES)
+
+def test_parse(store):
+    entry = store.parse("árbol")
+    assert entry.title == "árbol"
+    assert [s.title for s in entry.filter_sections()] == ["Spanish", "Noun"]
+
+    assert store.parse("missing") is None
+
+    # Unsafe pages follow the same rules as parse()
+    assert store.parse("unclosed") is None
+    assert store.parse("unclosed", log=[]) is not None
+
+def test_duplicate_titles(tmp_path):
+    path = str(tmp_path / "pages.dat")
+    with PageStoreWriter(path) as writer:
+        writer.add("test", "old")
+        writer.add("test", "new")
+
+    store = PageStore(path)
+    assert len(store) == 1
+    assert store["test"] == "new"
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / "pages.dat")
+    build_pagestore(path, [])
+    store = PageStore(path)
+    assert len(store) == 0
+    assert "test" not in store
+
+def test_pickle(store):
+    clone = pickle.loads(pickle.dumps(store))
+    assert clone["test"] == store["test"]
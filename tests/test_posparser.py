@@ -1,3 +1,5 @@
+import random
+import re
 import pytest
 import enwiktionary_sectionparser as parser
 import enwiktionary_sectionparser.posparser as posparser
@@ -66,6 +68,210 @@ def test_item_types():
 
 
 
+def test_item_type_cache():
+    text = """\
+===Noun===
+# {{lb|en|foo}} sense1
+#: ''A '''test''' sentence.''
+#:: A '''translated''' sentence.
+# {{lb|en|foo}} sense1
+#: ''A '''test''' sentence.''
+#: {{rfquote-sense|en}}
+"""
+    section = parser.parse(text, "test").filter_sections(matches="Noun")[0]
+    uncached = parser.parse_pos(section, type_cache=False)
+
+    cache = posparser.ItemTypeCache()
+    pos = parser.parse_pos(section, type_cache=cache)
+    assert str(pos) == str(uncached)
+    for sense, expected in zip(pos.senses, uncached.senses):
+        assert sense._type == expected._type
+        assert [c._type for c in sense._children] == [c._type for c in expected._children]
+
+    # Items with the same data but different children are cached separately
+    assert pos.senses[0]._children[0]._type == "bare_ux"
+    assert cache.hits == 0 and cache.misses == 6
+    assert len(cache) == 6
+
+    parser.parse_pos(section, type_cache=cache)
+    assert cache.hits == 6
+    assert cache.hit_rate == 0.5
+
+    small = posparser.ItemTypeCache(maxsize=2)
+    parser.parse_pos(section, type_cache=small)
+    assert len(small) == 2
+
+    # Items with long data, or a long first child, are not cached
+    short = posparser.ItemTypeCache(maxlen=20)
+    pos = parser.parse_pos(section, type_cache=short)
+    assert len(short) == 1
+    assert [c._type for c in pos.senses[0]._children] == [c._type for c in uncached.senses[0]._children]
+
+    cache.clear()
+    assert len(cache) == 0 and cache.hit_rate == 0
+
+def test_item_classifiers():
+    text = """\
+===Noun===
+# {{lb|en|foo}} sense1
+#: {{coordinate_terms|en|bar}}
+#: {{zh-x|你好|hello|ref=foo}}
+#: {{zh-x|你好|hello}}
+#: {{RQ:Shakespeare Hamlet}}
+#: '''1999''', John Doe, ''Book''
+#: {{lang|es|hola}} — hello
+#: Just some text
+"""
+    section = parser.parse(text, "test").filter_sections(matches="Noun")[0]
+    pos = parser.parse_pos(section, type_cache=False)
+    assert [c._type for c in pos.senses[0]._children] == ["cot", "quote", "ux", "quote", "bare_quote", "bare_uxi", "unknown"]
+
+    classifiers = posparser.ItemClassifiers()
+    classifiers.add_templates("cot", ["coordinate_terms"])
+    classifiers.add_templates("sense", ["lb"])
+    classifiers.add_heuristic("note", r"(?i)just", priority=1)
+    classifiers.add_heuristic("text", check=lambda item: " " in item.data)
+    pos = parser.parse_pos(section, type_cache=False, classifiers=classifiers)
+    assert [c._type for c in pos.senses[0]._children] == ["cot", "unknown", "unknown", "text", "text", "text", "note"]
+
+    # Adding a classifier invalidates cached types
+    cache = posparser.ItemTypeCache()
+    parser.parse_pos(section, type_cache=cache, classifiers=classifiers)
+    classifiers.add_heuristic("rq", r"\s*{{RQ:", priority=2)
+    pos = parser.parse_pos(section, type_cache=cache, classifiers=classifiers)
+    assert cache.hits == 0
+    assert pos.senses[0]._children[3]._type == "rq"
+
+    with pytest.raises(ValueError):
+        classifiers.add_heuristic("bad")
+
+def test_lazy():
+    text = """\
+===Noun===
+{{en-noun}}
+
+
+#
+# {{lb|en|foo}} sense1
+#: ''A '''test''' sentence.''
+#:: A '''translated''' sentence.
+##  subsense
+
+# [[sense2]]
+#* {{RQ:Shakespeare Hamlet}}
+#*: quote text
+# [[sense3]]
+"""
+    section = parser.parse(text, "test").filter_sections(matches="Noun")[0]
+    pos = parser.parse_pos(section, type_cache=False)
+
+    lazy = parser.parse_pos(section, type_cache=False, lazy=True)
+    assert lazy.headlines == pos.headlines
+    assert "senses" not in lazy.__dict__
+
+    # Streaming the first sense doesn't create the others, or any children or types
+    first = next(lazy.iter_senses())
+    assert first.name == "#1" and first.data == "{{lb|en|foo}} sense1"
+    assert lazy._pending_senses[1][3] is None
+    assert "_children" not in first.__dict__ and "_type" not in first.__dict__
+
+    assert lazy.changelog == pos.changelog
+    assert str(lazy) == str(pos)
+
+    def items(senses):
+        for item in senses:
+            yield item
+            yield from items(item._children)
+
+    assert [(i.name, i._line, i._type) for i in items(lazy.senses)] == [(i.name, i._line, i._type) for i in items(pos.senses)]
+    assert lazy.span(lazy.senses[1]) == pos.span(pos.senses[1])
+
+    # Types are set for an item and its siblings when they're first used
+    lazy = parser.parse_pos(section, type_cache=False, lazy=True)
+    child = lazy.senses[1]._children[0]
+    assert "_type" not in lazy.senses[0].__dict__
+    assert child._type == "quote"
+    assert lazy.senses[0]._type == "sense"
+    assert "_type" not in child._children[0].__dict__
+
+    # Lists with lines that aren't list items are handled like the eager parser
+    section = parser.parse("===Noun===\n# foo\nbar\n# baz\n", "test").filter_sections(matches="Noun")[0]
+    assert parser.parse_pos(section, lazy=True).senses == []
+
+    # Lists where every item is empty have the same changes
+    section = parser.parse("===Noun===\n{{en-noun}}\n\n#\n\n# \n#:\n", "test").filter_sections(matches="Noun")[0]
+    pos = parser.parse_pos(section)
+    lazy = parser.parse_pos(section, lazy=True)
+    assert lazy.senses == pos.senses == []
+    assert lazy.changelog == pos.changelog
+    assert "removed empty item" in lazy.changelog
+
+# The heuristics before they were given early exits, is_bare_ux() and the
+# functions it uses must give the same results
+def _reference_is_sentence(text):
+    text = re.sub(r"\[\[(?:[^\[\]]*[|])?(.*?)\]\]", r"\1", text)
+    text = re.sub(r"{{(?:l|m)[|].*?[|](.*?)}}", r"\1", text)
+    return bool(re.match(r"""^\W*[A-Z].*[.?!]["'\W]*$""", text))
+
+def _reference_is_italic(text):
+    ital = "(?<!')(?:'{2}|'{5})(?!')"
+    return bool(re.match(fr"{ital}.*{ital}$", text) and not re.search(ital, text[2:-2]))
+
+def _reference_is_bold(text):
+    bold = "(?<!')(?:'{3}|'{5})(?!')"
+    return bool(re.match(fr"{bold}.*{bold}$", text) and not re.search(bold, text[3:-3]))
+
+def _reference_is_translation(item):
+    return _reference_is_sentence(item.data) and item.data.count("'''") > 1 and not item._children
+
+def _reference_is_bare_ux(item):
+    if not _reference_is_italic(item.data) or not item.data.count("'''") > 1:
+        return False
+    if not item._children:
+        return True
+    return len(item._children) == 1 and _reference_is_translation(item._children[0])
+
+def test_heuristics_equivalence():
+    rng = random.Random(49)
+    tokens = ["'", "''", "'''", "'''''", "a", "A", " ", ".", "?", "!", ";", "\n", "[[", "]]", "|", "{{", "}}",
+        "{{l|en|", "{{m|es|", "Word", "—", '"']
+    texts = ["", "''", "'''", "''''", "'''''", "''a''", "'''a'''", "''a''\n", "'''''a'''''", "''a '''b''' c.''",
+        "''A '''test''' sentence.''", "A '''translated''' sentence.", "[[a|A]] '''b''' c!", "{{l|en|A}} '''b''' c?"]
+    texts += ["".join(rng.choice(tokens) for _ in range(rng.randint(1, 12))) for _ in range(20000)]
+    # Mostly italic passages and sentences, to exercise everything after the early exits
+    texts += [rng.choice(["''", "'''''", "A "]) + "".join(rng.choice(tokens) for _ in range(rng.randint(0, 8)))
+        + rng.choice(["''", "'''''", "''\n", ".", "!'''"]) for _ in range(20000)]
+
+    for text in texts:
+        assert posparser.is_sentence(text) == _reference_is_sentence(text), text
+        assert bool(posparser.is_italic(text)) == _reference_is_italic(text), text
+        assert bool(posparser.is_bold(text)) == _reference_is_bold(text), text
+
+        features = posparser.ItemFeatures(text)
+        assert features.italic == _reference_is_italic(text), text
+        assert features.bold_count == text.count("'''"), text
+        assert features.sentence == _reference_is_sentence(text), text
+
+    for text, child_text in zip(texts, reversed(texts)):
+        if not text or not child_text:
+            continue
+        item = posparser.ListItem(None, "#", text, "#1")
+        assert is_bare_ux(item) == _reference_is_bare_ux(item), text
+        item._children.append(posparser.ListItem(item, "#:", child_text, "#1:1"))
+        assert is_bare_ux(item) == _reference_is_bare_ux(item), (text, child_text)
+        assert posparser.is_translation(item._children[0]) == _reference_is_translation(item._children[0]), child_text
+
+def test_item_features():
+    item = posparser.ListItem(None, "#", "''A '''test''' sentence.''", "#1")
+    features = posparser.item_features(item)
+    assert features.italic and features.bold_count == 2 and features.sentence
+    assert posparser.item_features(item) is features
+
+    # Features are found again when the data changes
+    item.data = "a '''test''' ''sentence''"
+    features = posparser.item_features(item)
+    assert not features.italic and features.bold_count == 2 and not features.sentence
+
 def test_is_sentence():
     assert is_sentence("This is a sentence.") == True
     assert is_sentence("This is a sentence?") == True
@@ -194,9 +400,41 @@ def test_strip_template_links():
     assert posparser.strip_template_links("a {{m|en|b}} c") == "a b c"
     assert posparser.strip_template_links("a {{x|en|b}} c") == "a {{x|en|b}} c"
 
+def test_top_templates():
+    assert [str(t) for t in posparser.top_templates("{{a}} b {{c|{{d}}}}")] == ["{{a}}", "{{c|{{d}}}}"]
+    # mwparserfromhell parses this as a heading, not a template
+    assert posparser.top_templates("={{ux|en|a}}=") == []
+
 def test_strip_safe_templates():
     assert posparser.strip_safe_templates("a {{b|test}} c") == "a {{b|test}} c"
     assert posparser.strip_safe_templates("a {{attn|en|test}} c") == "a  c"
     assert posparser.strip_safe_templates("a {{C|en|test}} c") == "a  c"
     assert posparser.strip_safe_templates("a {{test|foo{{attn|test}}bar}} c") == "a {{test|foobar}} c"
     assert posparser.strip_safe_templates("a {{attn|en|foo{{test|test}}bar}} c") == "a  c"
+
+def test_spans():
+    text = """\
+==English==
+
+===Noun===
+{{en-noun}}
+
+# test
+## sub
+# other
+"""
+    entry = parser.parse(text, "test")
+    noun = entry.filter_sections(matches="Noun")[0]
+
+    pos = parser.parse_pos(noun)
+    assert pos.raw_text(pos.senses[0]) == "# test\n## sub"
+    assert text[slice(*pos.span(pos.senses[1]))] == "# other"
+
+    # Modified items have no span
+    pos.senses[0].data = "changed"
+    assert pos.span(pos.senses[0]) is None
+    assert pos.span(pos.senses[1])
+
+    # Neither do the items of a modified section
+    noun.add_line("# new")
+    assert pos.span(pos.senses[1]) is None
@@ -0,0 +1,61 @@
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.profiling import Profile
+
+TEXT = """\
+==English==
+
+===Noun===
+{{en-noun}}
+
+# {{lb|en|rare}} A [[test]].
+#: {{ux|en|A '''test'''.}}
+# Another test.
+
+[[Category:en:Tests]]
+"""
+
+def test_profile():
+    profile = Profile()
+
+    for _ in range(3):
+        entry = parser.parse(TEXT, "test", profile=profile)
+        str(entry)
+        for section in entry.ifilter_sections(matches="Noun"):
+            # Cached item types would skip the timed phases
+            parser.parse_pos(section, profile=profile, type_cache=False)
+
+    assert profile.calls["parse"] == 3
+    assert profile.calls["splitlines"] == 3
+    assert profile.calls["heading"] == 6
+    assert profile.calls["heading_match"] == 3 * len(TEXT.splitlines())
+    assert profile.calls["add.categories"] > 0
+    assert profile.calls["serialize"] == 3
+    assert profile.calls["pos"] == 3
+    assert profile.calls["pos.parse_list"] == 3
+    assert profile.calls["pos.set_item_types"] == 3
+    assert profile.calls["pos.set_item_types.templates"] == 6
+    assert profile.calls["pos.set_item_types.heuristics"] == 3
+
+    assert profile.times["parse"] >= profile.times["splitlines"]
+    assert profile.times["add"] >= profile.times["add.categories"]
+
+    report = profile.report()
+    assert "pos.set_item_types.templates" in report
+
+def test_phase():
+    profile = Profile()
+    with profile.phase("custom"):
+        pass
+    with profile.phase("custom"):
+        pass
+    assert profile.calls["custom"] == 2
+
+    total = Profile()
+    total.merge(profile)
+    total.merge(profile)
+    assert total.calls["custom"] == 4
+    assert total.times["custom"] == 2 * profile.times["custom"]
+
+def test_disabled():
+    entry = parser.parse(TEXT, "test")
+    assert entry._profile is None
@@ -0,0 +1,92 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.query import compile_path, run_query
+
+TEXT = """\
+==English==
+
+===Noun===
+# test
+
+====Usage notes====
+English notes
+
+==Spanish==
+
+===Etymology 1===
+
+====Noun====
+# test
+
+=====Usage notes=====
+Spanish notes
+
+===Etymology 2===
+
+====Verb====
+# test
+
+==Ladino==
+
+===Verb===
+# test
+"""
+
+def test_match():
+    query = compile_path("Spanish/Etymology */Noun/Usage notes")
+    assert query.match(["Spanish", "Etymology 1", "Noun", "Usage notes"])
+    assert not query.match(["Spanish", "Etymology 1", "Noun"])
+    assert not query.match(["English", "Etymology 1", "Noun", "Usage notes"])
+    assert query.match_prefix(["Spanish", "Etymology 1"])
+    assert not query.match_prefix(["English"])
+
+    query = compile_path("**/Usage notes")
+    assert query.match(["Usage notes"])
+    assert query.match(["Spanish", "Etymology 1", "Noun", "Usage notes"])
+    assert not query.match(["Spanish", "Usage notes", "Noun"])
+
+    query = compile_path("Spanish/**/Verb")
+    assert query.match(["Spanish", "Verb"])
+    assert query.match(["Spanish", "Etymology 2", "Verb"])
+    assert not query.match(["Ladino", "Verb"])
+
+    # Queries can be sent to worker processes
+    assert pickle.loads(pickle.dumps(query)).match(["Spanish", "Verb"])
+
+    with pytest.raises(ValueError):
+        compile_path("Spanish//Noun")
+
+    # Names can be given as a tuple or a list
+    assert compile_path(("Spanish", "**", "Verb")).match(["Spanish", "Etymology 2", "Verb"])
+    assert compile_path(["Spanish", "**", "Verb"]) is compile_path(("Spanish", "**", "Verb"))
+
+def test_query_page():
+    query = compile_path("Spanish/Etymology */Noun/Usage notes")
+    assert query.query_page(TEXT, "test") == [("test", "Spanish:Etymology 1:Noun:Usage notes", "\n=====Usage notes=====\nSpanish notes\n")]
+
+    assert [path for _, path, _ in compile_path("*/Verb").query_page(TEXT, "test")] == ["Ladino:Verb"]
+    assert [path for _, path, _ in compile_path("**/Verb").query_page(TEXT, "test")] == ["Spanish:Etymology 2:Verb", "Ladino:Verb"]
+
+    # Same text as the full parser
+    entry = parser.parse(TEXT, "test")
+    spanish = entry.filter_sections(matches="Spanish")[0]
+    assert compile_path("Spanish").query_page(TEXT, "test") == [("test", "Spanish", str(spanish))]
+
+    # Only blocks that contain a match are parsed
+    assert compile_path("Spanish/Noun")._blocks(TEXT) == []
+    assert compile_path("Ladino/Verb")._blocks(TEXT) == [(TEXT.index("==Ladino"), len(TEXT))]
+
+def test_unclosed():
+    text = "==English==\n===Noun===\n{{unclosed\n\n==Spanish==\n===Noun===\n# test\n"
+    assert list(run_query("*/Noun", [(text, "test")])) == []
+
+def test_run_query():
+    pages = [(TEXT, f"test{i}") for i in range(10)]
+    expected = list(run_query("**/Verb", pages))
+    assert len(expected) == 20
+
+    with ThreadPoolExecutor(2) as executor:
+        assert list(run_query("**/Verb", pages, executor=executor, chunksize=3, prefetch=2)) == expected
@@ -461,3 +461,486 @@ def test_add_line():
     assert res.splitlines() == result.splitlines()
 
 
+
+def test_fork():
+    text = """\
+==English==
+
+===Noun===
+{{en-noun}}
+
+# test
+
+====Synonyms====
+* {{l|en|foo}}
+
+==Spanish==
+
+===Noun===
+{{es-noun|m}}
+
+# test
+"""
+
+    entry = sectionparser.parse(text, "test")
+    original = str(entry)
+
+    fork = entry.fork()
+    assert str(fork) == original
+
+    # Untouched sections share their data with the original
+    assert fork._children is entry._children
+
+    synonyms = fork.filter_sections(matches="Synonyms")[0]
+    assert synonyms.path == "English:Noun:Synonyms"
+    synonyms.add_line("* {{l|en|bar}}")
+    fork.filter_sections(matches="Spanish")[0].add_child("Anagrams", "* test")
+
+    assert str(entry) == original
+    assert "{{l|en|bar}}" in str(fork)
+    assert "Anagrams" in str(fork)
+
+    # Sections that weren't modified still share their lines
+    fork_noun = fork.filter_sections(matches="Noun")[0]
+    entry_noun = entry.filter_sections(matches="Noun")[0]
+    assert fork_noun is not entry_noun
+    assert fork_noun._content_wikilines is entry_noun._content_wikilines
+
+    # Changes to the original don't show up in the fork
+    fork_text = str(fork)
+    entry_noun.add_line("[[Category:en:Test]]")
+    entry_noun.add_child("Usage notes", "Test")
+    entry.filter_sections(matches="Spanish")[0].reparent(entry_noun)
+    assert str(fork) == fork_text
+    assert "Category:en:Test" in str(entry)
+    assert "Category:en:Test" not in str(fork)
+
+    # Forks of forks
+    fork2 = fork.fork()
+    fork2.filter_sections(matches="Synonyms")[0].add_line("* {{l|en|baz}}")
+    assert str(fork) == fork_text
+    assert "baz" in str(fork2)
+
+def test_fork_deep_edit_before_visit():
+    text = "==English==\n===Noun===\n# test\n====Synonyms====\n* foo\n"
+    entry = sectionparser.parse(text, "test")
+    synonyms = entry.filter_sections(matches="Synonyms")[0]
+
+    fork = entry.fork()
+    synonyms.add_line("* bar")
+
+    assert "bar" in str(entry)
+    assert "bar" not in str(fork)
+    assert "bar" not in str(fork.filter_sections(matches="Synonyms")[0])
+
+def test_fork_attributes():
+    text = "==English==\n===Noun===\n# test\n====Synonyms====\n* foo\n"
+    entry = sectionparser.parse(text, "test")
+    original = str(entry)
+    fork = entry.fork()
+
+    # Setting heading attributes directly is isolated like the other modifications
+    entry.filter_sections(matches="Noun")[0].title = "Verb"
+    entry.filter_sections(matches="Synonyms")[0].level = 5
+    assert "===Verb===" in str(entry) and "=====Synonyms=====" in str(entry)
+    assert str(fork) == original
+
+    fork.filter_sections(matches="Noun")[0].count = "2"
+    assert "===Noun 2===" in str(fork)
+    assert "===Verb===" in str(entry)
+
+def test_fork_content_wikilines():
+    text = "==English==\n===Noun===\n# test\n====Synonyms====\n* foo\n"
+    entry = sectionparser.parse(text, "test")
+    fork = entry.fork()
+
+    # Read only walks don't copy anything on the original side
+    entry_noun = entry.filter_sections(matches="Noun")[0]
+    assert fork._children is entry._children
+
+    # The line lists are copied when they're handed out, so they can be modified in place
+    fork_noun = fork.filter_sections(matches="Noun")[0]
+    assert fork_noun._content_wikilines is entry_noun._content_wikilines
+    fork_noun.content_wikilines.append("# other")
+    assert "# other" in str(fork)
+    assert "# other" not in str(entry)
+
+    entry.filter_sections(matches="Synonyms")[0].content_wikilines[0] = "* bar"
+    assert "* bar" in str(entry)
+    assert "* bar" not in str(fork)
+    assert "* foo" in str(fork.filter_sections(matches="Synonyms")[0])
+
+    fork.content_wikilines.append("{{also|test}}")
+    assert str(entry).startswith("==English==")
+
+def test_parse_many():
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    pages = [(f"==English==\n===Noun===\n# test {i}\n", f"test{i}") for i in range(20)]
+    pages.insert(5, ("==English==\n{{unclosed\n", "unclosed"))
+    pages.insert(10, ("== English ==\n===Noun===\n# test\n", "spaces"))
+
+    expected = [sectionparser.parse(text, title) for text, title in pages]
+    expected_text = [str(e) if e else None for e in expected]
+
+    res = list(sectionparser.parse_many(pages))
+    assert [str(e) if e else None for e in res] == expected_text
+
+    for executor in (ThreadPoolExecutor(2), ProcessPoolExecutor(2)):
+        with executor:
+            res = list(sectionparser.parse_many(pages, executor=executor, chunksize=3, prefetch=2))
+        assert [str(e) if e else None for e in res] == expected_text
+        assert [e.title for e in res if e] == [e.title for e in expected if e]
+        assert res[10].changelog == expected[10].changelog
+
+def test_parse_many_log():
+    from concurrent.futures import ProcessPoolExecutor
+
+    pages = [("==English==\n===Noun=== text\n# test\n", "a"), ("==English==\n{{unclosed\n", "b")]
+
+    expected_log = []
+    for text, title in pages:
+        sectionparser.parse(text, title, expected_log)
+
+    log = []
+    with ProcessPoolExecutor(2) as executor:
+        res = list(sectionparser.parse_many(pages, executor=executor, chunksize=1, log=log))
+
+    assert log == expected_log
+    assert res[1] is not None and res[1]._state
+    assert res[0]._log.items is log
+
+def test_lazy_posparser():
+    assert sectionparser.PosParser is sectionparser.posparser.PosParser
+    with pytest.raises(AttributeError):
+        sectionparser.NotAThing
+
+def test_scan_headings():
+    text = """\
+==English==
+<!--
+===Noun===
+-->
+
+===Etymology 1===
+{{test|
+===Verb===
+}}
+
+====Noun====
+# test
+
+===Etymology 2.3===
+
+====Verb====
+
+==Spanish==
+"""
+    headings = sectionparser.scan_headings(text)
+    assert [h[1:] for h in headings] == [
+        (2, "English", ""),
+        (3, "Etymology", "1"),
+        (4, "Noun", ""),
+        (3, "Etymology", "2.3"),
+        (4, "Verb", ""),
+        (2, "Spanish", ""),
+    ]
+    assert all(text[offset:].startswith("==") for offset, *_ in headings)
+
+    entry = sectionparser.parse(text, "test")
+    assert [h[1:] for h in headings] == [(s.level, s.title, s.count) for s in entry.ifilter_sections()]
+    assert [path for offset, path in sectionparser.heading_paths(headings)] == [s.path for s in entry.ifilter_sections()]
+    assert list(sectionparser.heading_paths(headings))[2] == (headings[2][0], "English:Etymology 1:Noun")
+
+def test_filter_sections_path():
+    text = """\
+==English==
+
+===Etymology 1===
+
+====Noun====
+# test
+
+=====Usage notes=====
+English notes
+
+===Etymology 2===
+
+====Noun====
+# test
+
+==Spanish==
+
+===Noun===
+# test
+
+====Usage notes====
+Spanish notes
+"""
+    entry = sectionparser.parse(text, "test")
+
+    assert [s.path for s in entry.filter_sections(matches=("English", "Etymology", "Noun"))] == ["English:Etymology 1:Noun", "English:Etymology 2:Noun"]
+    assert [s.path for s in entry.filter_sections(matches=("English", "Etymology 2", "Noun"))] == ["English:Etymology 2:Noun"]
+    assert [s.path for s in entry.filter_sections(matches=("*", "Noun"))] == ["Spanish:Noun"]
+    assert [s.path for s in entry.filter_sections(matches=("**", "Usage notes"))] == ["English:Etymology 1:Noun:Usage notes", "Spanish:Noun:Usage notes"]
+    assert entry.filter_sections(matches=("English",), recursive=False) == entry.filter_sections(matches="English", recursive=False)
+
+    # Paths are relative to the section being searched
+    english = entry.filter_sections(matches="English")[0]
+    assert [s.path for s in english.filter_sections(matches=("*", "Noun"))] == ["English:Etymology 1:Noun", "English:Etymology 2:Noun"]
+
+    # Sections that can't match are never visited
+    spanish = entry.filter_sections(matches="Spanish")[0]
+    spanish._children = None
+    assert [s.path for s in entry.filter_sections(matches=("English", "**", "Usage notes"))] == ["English:Etymology 1:Noun:Usage notes"]
+
+def test_replace_text():
+    text = """\
+==English==
+
+===Etymology 1===
+From foo.
+
+====Noun====
+# test
+
+===Etymology 2===
+
+====Verb====
+# verb
+
+==Spanish==
+
+===Noun===
+# test
+
+[[Category:es:Foo]]
+"""
+    entry = sectionparser.parse(text, "test")
+    spanish = entry.filter_sections(matches="Spanish")[0]
+    ety = entry.filter_sections(matches=("English", "Etymology 1"))[0]
+    noun = ety._children[0]
+
+    ety.replace_text(str(ety).replace("# test", "# changed\n\n=====Usage notes=====\nnotes\n\n[[Category:en:Foo]]"))
+    assert str(entry) == str(sectionparser.parse(str(entry), "test"))
+    assert [s.path for s in ety.ifilter_sections()] == ["English:Etymology 1:Noun", "English:Etymology 1:Noun:Usage notes"]
+    assert ety._children[0] is not noun
+    assert all(s._topmost is ety._topmost for s in ety.ifilter_sections())
+
+    # Categories are moved to the L2
+    assert "[[Category:en:Foo]]" in ety._topmost.categories
+    assert "Category" not in str(ety)
+
+    # Other sections are untouched
+    assert entry.filter_sections(matches="Spanish")[0] is spanish
+
+    # The heading is optional and can change the title
+    ety.replace_text("From bar.\n")
+    assert str(ety) == "\n===Etymology 1===\nFrom bar.\n"
+    ety.replace_text("\n===Etymology 3===\nFrom baz.\n")
+    assert ety.path == "English:Etymology 3"
+
+    # L2 sections keep their own categories
+    spanish.replace_text("==Spanish==\n\n===Verb===\n# x\n\n{{c|es|Verbs}}\n")
+    assert spanish.categories == "\n{{c|es|Verbs}}\n"
+    assert str(entry) == str(sectionparser.parse(str(entry), "test"))
+
+    with pytest.raises(ValueError):
+        ety.replace_text("From bar.\n\n===Etymology 4===\n")
+    with pytest.raises(ValueError):
+        ety.replace_text("From bar.\n\n==Spanish==\n")
+    with pytest.raises(ValueError):
+        ety.replace_text("From {{bar.\n")
+    assert str(ety) == "\n===Etymology 3===\nFrom baz.\n"
+
+def test_replace_text_fork():
+    text = "==English==\n\n===Noun===\n# test\n\n====Usage notes====\nnotes\n"
+    entry = sectionparser.parse(text, "test")
+    fork = entry.fork()
+    noun = fork.filter_sections(matches="Noun")[0]
+    noun.replace_text("# changed\n")
+    assert str(entry) == text.rstrip()
+    assert str(fork) == "==English==\n\n===Noun===\n# changed"
+
+def test_replace_text_changes():
+    text = """\
+==English==
+
+===Noun===
+# test
+
+
+==== Usage notes ====
+notes
+
+===Verb===
+# verb
+"""
+    entry = sectionparser.parse(text, "test")
+    fork = entry.fork()
+    assert entry.changelog == "one empty line between sections per [[WT:NORM]]; no leading or trailing spaces on section headers per [[WT:NORM]]"
+
+    # The changes of the old section are replaced by the changes of the new text
+    noun = entry.filter_sections(matches="Noun")[0]
+    noun.replace_text("# test\n\n====Usage notes====\nnotes\n")
+    assert entry.changelog == ""
+    assert fork.changelog == sectionparser.parse(text, "test").changelog
+
+    noun.replace_text("# test\n====Usage notes====\nnotes\n")
+    assert entry.changelog == "one empty line between sections per [[WT:NORM]]"
+
+def test_replace_text_matches_parse():
+    text = """\
+==English==
+
+===Noun===
+# test
+
+[[Category:en:Foo]]
+
+====Usage notes====
+notes
+[[Category:en:Bar]]
+
+===Verb===
+# verb
+
+[[Category:en:Baz]]
+[[Category:en:Foo]]
+"""
+
+    def check(path, new_text):
+        entry = sectionparser.parse(text, "test")
+        section = entry.filter_sections(matches=path)[0]
+        expected = sectionparser.parse(text.replace(section.raw_text, new_text), "test")
+        section.replace_text(new_text)
+        assert str(entry) == str(expected)
+        assert entry.changelog == expected.changelog
+        return entry
+
+    # Replacing a section with its own text changes nothing
+    noun = sectionparser.parse(text, "test").filter_sections(matches="Noun")[0]
+    entry = check("Noun", noun.raw_text)
+    assert entry.changelog == sectionparser.parse(text, "test").changelog
+
+    # Removed categories are dropped, categories of later sections stay in place
+    entry = check("Noun", "===Noun===\n# test\n\n====Usage notes====\nnotes\n")
+    assert entry.filter_sections(matches="English")[0]._categories == ["[[Category:en:Baz]]", "[[Category:en:Foo]]"]
+
+    # Missing trailing empty line
+    check(("English", "Noun", "Usage notes"), "====Usage notes====\nnotes")
+    check("Verb", "===Verb===\n# changed\n[[Category:en:Foo]]")
+
+def test_parse_previous():
+    text = """\
+{{also|Test}}
+==English==
+
+===Noun===
+# test
+
+==Spanish==
+
+===Noun===
+# prueba
+
+==Zulu==
+===Noun===
+# x
+----
+"""
+    old = sectionparser.parse(text, "test")
+    english = old.filter_sections(matches="English")[0]
+
+    new_text = text.replace("# prueba", "# prueba\n# otra")
+    full = sectionparser.parse(new_text, "test")
+    entry = sectionparser.parse(new_text, "test", previous=old)
+
+    # Unchanged sections are shared until they are modified
+    reused = entry.filter_sections(recursive=False, matches="English")[0]
+    assert reused is not english
+    assert reused._children is english._children
+
+    assert str(entry) == str(full)
+    assert entry.changelog == full.changelog
+    assert [s.path for s in entry.ifilter_sections()] == [s.path for s in full.ifilter_sections()]
+
+    reused.filter_sections(matches="Noun")[0].replace_text("# changed\n")
+    assert "# changed" in str(entry)
+    assert "# changed" not in str(old)
+
+    # Modified sections are parsed again
+    english.filter_sections(matches="Noun")[0].replace_text("# old\n")
+    entry = sectionparser.parse(text, "test", previous=old)
+    assert str(entry) == str(sectionparser.parse(text, "test"))
+
+    # Unclosed templates fall back to a full parse
+    assert sectionparser.parse(text + "{{unclosed\n", "test", previous=old) is None
+
+def test_parse_previous_edited():
+    text = "==English==\n===Noun===\n# test\n\n==Spanish==\n===Noun===\n# prueba\n\n"
+    new_text = "==Aari==\n===Noun===\n# x\n\n" + text
+
+    # Sections edited in place in the old tree are parsed again
+    old = sectionparser.parse(text, "test")
+    old.filter_sections(matches=("English", "Noun"))[0].content_wikilines.append("# z")
+    old.filter_sections(matches=("Spanish", "Noun"))[0].title = "Verb"
+    entry = sectionparser.parse(new_text, "test", previous=old)
+    assert str(entry) == str(sectionparser.parse(new_text, "test"))
+
+    # Nothing is reused when logging, so every message is logged
+    text = "==English==\n===Noun=== oops\n# test\n\n"
+    old = sectionparser.parse(text, "test")
+    assert sectionparser.parse("==Aari==\n# x\n\n" + text, "test", previous=old)._children[1]._children is old._children[0]._children
+    log = []
+    sectionparser.parse("==Aari==\n# x\n\n" + text, "test", log=log, previous=old)
+    assert log == [("text_on_title", "test:English:Noun", "===Noun=== oops")]
+
+def test_spans():
+    text = """\
+{{also|Test}}
+==English==
+
+===Noun===
+{{en-noun}}
+
+# test
+## sub
+# other
+
+====Usage notes====
+notes
+[[Category:en:Test]]
+
+==Spanish==
+
+===Noun===
+# prueba
+"""
+    entry = sectionparser.parse(text, "test")
+    english, spanish = entry.filter_sections(recursive=False)
+    noun = english.filter_sections(matches="Noun")[0]
+
+    assert english.raw_text == text[text.index("==English=="):text.index("\n\n==Spanish==")+1]
+    assert spanish.raw_text == text[text.index("==Spanish=="):-1]
+    assert text[slice(*noun.heading_span)] == "===Noun==="
+    assert [text[start:end] for start, end in noun.line_spans()] == noun.content_wikilines
+
+    # Spans are the same when sections are reused from another revision
+    new_text = "==Aaa==\n# a\n\n" + text.replace("# prueba", "# otra")
+    new_entry = sectionparser.parse(new_text, "test", previous=entry)
+    assert [s.span for s in new_entry.ifilter_sections()] == \
+            [s.span for s in sectionparser.parse(new_text, "test").ifilter_sections()]
+
+    # Modified sections and their parents have no span
+    noun.add_line("# new")
+    assert noun.span is None and english.span is None and entry.span is None
+    assert noun.line_spans() is None
+    assert spanish.raw_text == text[text.index("==Spanish=="):-1]
+    assert english.filter_sections(matches="Usage notes")[0].span
+
+    # Taking the lines list counts as a modification, since it can be changed in place
+    spanish_noun = spanish.filter_sections(matches="Noun")[0]
+    assert spanish_noun.span
+    spanish_noun.content_wikilines.append("# z")
+    assert spanish_noun.span is None and spanish_noun.raw_text is None and spanish.span is None
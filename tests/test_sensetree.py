@@ -0,0 +1,85 @@
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.sensetree import SenseTree, CompactListItem
+from enwiktionary_sectionparser.memory import memory_report
+
+TEXT = """==English==
+
+===Noun===
+{{en-noun}}
+
+# {{lb|en|foo}} sense1
+#: ''A '''test''' sentence.''
+#:: A '''translated''' sentence.
+## subsense
+#: {{ux|en|example}}
+# [[sense2]] ünïcode
+#* {{quote-book|en|year=1999}}
+#*: quote text
+
+===Verb===
+{{en-verb}}
+
+# [[verb]]
+"""
+
+def _walk(items):
+    for item in items:
+        yield item
+        yield from _walk(item._children)
+
+def _items(entry):
+    sections = [s for s in entry.ifilter_sections() if s.title in parser.ALL_POS]
+    return sections, [parser.parse_pos(section) for section in sections]
+
+def test_sense_tree():
+    sections, pos_parsers = _items(parser.parse(TEXT, "test"))
+    tree = SenseTree()
+    for section, pos in zip(sections, pos_parsers):
+        tree.add(pos, key=("test", section.path))
+
+    assert len(tree) == 9
+    assert tree.section_count == 2
+
+    for section_idx, pos in enumerate(pos_parsers):
+        expected = list(_walk(pos.senses))
+        items = list(_walk(tree.senses(section_idx)))
+        assert [(i.name, i.level, i.prefix, i.style, i.data, i._type, str(i)) for i in items] == \
+               [(i.name, i.level, i.prefix, i.style, i.data, i._type, str(i)) for i in expected]
+        assert [i.parent.name if i.parent else None for i in items] == \
+               [i.parent.name if i.parent else None for i in expected]
+
+    item = tree[7]
+    assert item.name == "#2*1:1"
+    assert item.parent == tree[6]
+    assert tree.key(item) == ("test", sections[0].path)
+    assert tree.key(tree[-1]) == ("test", sections[1].path)
+    assert tree.senses(1)[0].name == "#1"
+
+    assert tree.count("quote") == 1
+    assert [i.name for i in tree.items("quote")] == ["#2*1"]
+    assert tree.count("sense") == len(list(tree.items("sense")))
+    assert list(tree.items("missing")) == []
+    assert len(list(tree.items())) == len(tree)
+
+    item._type = "note"
+    assert tree[7]._type == "note"
+    assert "note" in tree.types
+
+def test_sense_tree_memory():
+    entry = parser.parse(TEXT, "test")
+    sections, pos_parsers = _items(entry)
+    tree = SenseTree()
+    for pos in pos_parsers:
+        tree.add(pos)
+
+    report = memory_report(tree)
+    assert "ListItem" not in report.counts
+    assert report.total < memory_report(pos_parsers, exclude=[entry]).total
+
+def test_sense_tree_lazy():
+    entry = parser.parse(TEXT, "test")
+    noun = entry.filter_sections(matches="Noun")[0]
+    tree = SenseTree()
+    tree.add(parser.parse_pos(noun, lazy=True))
+    assert str(tree.senses(0)[0]) == str(parser.parse_pos(noun).senses[0])
+    assert isinstance(tree[0], CompactListItem)
@@ -0,0 +1,44 @@
+import enwiktionary_sectionparser as parser
+from enwiktionary_sectionparser.synthetic import PageGenerator, generate_pages
+
+def test_deterministic():
+    gen = PageGenerator(seed=5)
+    pages = list(gen.pages(10))
+    assert pages == list(PageGenerator(seed=5).pages(10))
+    assert pages != list(PageGenerator(seed=6).pages(10))
+
+    # page N doesn't depend on the pages before it
+    assert gen.page(7) == pages[7]
+    assert list(gen.pages(3, start=7)) == pages[7:]
+
+def test_size():
+    text, title = PageGenerator(seed=1, size=200000).page()
+    assert len(text) >= 200000
+    entry = parser.parse(text, title)
+    assert len(entry.filter_sections(recursive=False)) > 10
+
+def test_distributions():
+    gen = PageGenerator(seed=1, languages=(4, 4), etymologies=(2, 2), pos_per_etymology=(1, 1))
+    for text, title in gen.pages(5):
+        entry = parser.parse(text, title)
+        assert len(entry.filter_sections(recursive=False)) == 4
+        assert len(entry.filter_sections(matches="Etymology")) == 8
+
+def test_unclosed():
+    pages = list(generate_pages(20, seed=1, unclosed_rate=1))
+    assert all(parser.parse(text, title) is None for text, title in pages)
+
+def test_stress():
+    # Parsing should be stable and PosParser should handle every POS section
+    for text, title in generate_pages(100, seed=2, comment_rate=0.2, unclosed_rate=0.1, list_depth=4):
+        entry = parser.parse(text, title)
+        if not entry:
+            continue
+
+        res = str(entry)
+        assert str(parser.parse(res, title)) == res
+
+        for section in entry.ifilter_sections():
+            if section.title in parser.ALL_POS:
+                pos = parser.parse_pos(section)
+                assert pos.senses
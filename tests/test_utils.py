@@ -1,4 +1,4 @@
-from enwiktionary_sectionparser.utils import wiki_splitlines, wiki_finditer, wiki_replace, wiki_contains, wiki_resplit, wiki_split
+from enwiktionary_sectionparser.utils import wiki_splitlines, wiki_finditer, wiki_replace, wiki_contains, wiki_resplit, wiki_split, wiki_line_starts, scan_templates
 
 def test_wiki_splitlines():
 
@@ -230,3 +230,66 @@ def test_wiki_split():
     print(res)
     assert res == ['a (b|', '}}) c']
 
+
+def test_wiki_line_starts():
+    text = """\
+==A==
+{{test|
+==B==
+}}
+<!--
+==C==
+-->
+[[File:test.jpg|{{x}}
+==D==
+]] {{x}} [[y]]
+<nowiki>
+==E==
+</nowiki>
+==F=="""
+
+    assert [text[pos:pos+5] for pos in wiki_line_starts(text, "==")] == ["==A==", "==F=="]
+
+    assert wiki_line_starts(text, "{{") == [text.index("{{test")]
+    assert wiki_line_starts(text, "]]") == []
+
+def test_scan_templates():
+    text = "{{lb|en|rare}} [[a|b]] {{q|{{w|x}}}} <!-- {{c}} --> {{zh-x|a|ref=b}}"
+    templates = scan_templates(text)
+    assert [str(t) for t in templates] == ["{{lb|en|rare}}", "{{q|{{w|x}}}}", "{{zh-x|a|ref=b}}"]
+    assert [t.name for t in templates] == ["lb", "q", "zh-x"]
+    assert text[templates[1].start:templates[1].end] == "{{q|{{w|x}}}}"
+    assert templates[1].params == ["{{w|x}}"]
+    assert templates[2].has("ref") and templates[2].has("1") and not templates[2].has("2")
+    assert not templates[0].has("ref")
+
+    assert [str(t) for t in scan_templates(text, recursive=True)] == \
+            ["{{lb|en|rare}}", "{{q|{{w|x}}}}", "{{w|x}}", "{{zh-x|a|ref=b}}"]
+
+    assert [str(t) for t in scan_templates("'''1912''', {{w|Robert Frost}}, ''A Boy's Will''")] == ["{{w|Robert Frost}}"]
+    assert [str(t) for t in scan_templates("<ref name=x/> {{a}}<br>")] == ["{{a}}"]
+    assert scan_templates("no templates") == []
+
+    # Ambiguous markup is left to mwparserfromhell
+    assert scan_templates("{{a|{{{1}}}}}") is None
+    assert scan_templates("{{unclosed") is None
+    assert scan_templates("''italic {{a}}''") is None
+    assert scan_templates("[[a|{{b}}]]") is None
+    assert scan_templates("<ref>{{a}}</ref>") is None
+    assert scan_templates("{{a|<nowiki>}}</nowiki>}}") is None
+    assert scan_templates("={{a}}=") is None
+    assert scan_templates("b\n== {{a}} ==") is None
+
+def test_scan_templates_mwparser():
+    mwparserfromhell = __import__("mwparserfromhell")
+    samples = [
+        "{{a|b=c}} d {{e}}", "{{a}}}", "x{{a}}}}", "''a'' {{b}} '''c'''", "[http://x y] {{a}}",
+        "{{ a \n|b}}", "{{a\nb}}", "{{a|[[b|c]]|d=[[e]]}}", "{{a|<ref>{{b}}</ref>}}", "}} {{a}} ]]",
+        "={{a}}=", "={{a}}=b", "={{a}}",
+    ]
+    for text in samples:
+        templates = scan_templates(text)
+        if templates is None:
+            continue
+        expected = mwparserfromhell.parse(text).filter_templates(recursive=False)
+        assert [(str(t), str(t.name)) for t in templates] == [(str(t), str(t.name)) for t in expected]